@@ -7,30 +7,230 @@ with advanced AI models and post-processing capabilities
 
 import os
 import sys
-import requests
 import base64
+import hashlib
 import io
+import math
+import time
 import logging
+import threading
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Blueprint, Response, g, request, jsonify
+from werkzeug.security import safe_join
 from flask_cors import CORS
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
-import cv2
+
+from texture_cache import TextureCache, normalize_key, key_digest
+from texture_jobs import TextureJobManager, JobQueueFull
+from texture_formats import get_profile, negotiate_format, negotiate_sibling, extension_format, DEFAULT_FORMAT
+from texture_noise import NoiseField, VariantNoiseField, fbm, worley, load_noise_bank, noise_source, NOISE_BANK_DIR
+from texture_buffers import BufferPool
+from texture_presets import PresetManifest
+from texture_metrics import MetricsRegistry, StageClock
+from texture_flight import HostFlights
+from texture_admission import AdmissionController, AdmissionRejected
+from texture_atlas import pack_atlas, blit_wrapped, uv_rect
+from texture_pbr import derive_pbr_maps, LUMA_WEIGHTS
+from texture_variants import VariantCache, load_resized
+from texture_blobs import BlobStore
+from texture_static import StaticResponder
+from texture_tiling import TILED_FORMATS, open_pixel_buffer, scratch_file, box_reduce, write_image
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, origins="*")
+# Routes live on a blueprint; create_app() builds the Flask app around it
+texture_bp = Blueprint('textures', __name__)
+
+# Startup warmup: 'background' warms the pipeline in a thread while the app already
+# serves, 'sync' warms before create_app() returns (pre-fork under gunicorn --preload)
+WARMUP_MODES = ('background', 'sync', 'off')
+TEXTURE_WARMUP = os.environ.get('TEXTURE_WARMUP', 'background')
+
+# Metrics served at /api/metrics; requests for other categories are labeled 'other'
+# so arbitrary category strings cannot grow the number of series
+STAGE_SECONDS = 'texture_stage_seconds'
+REQUEST_SECONDS = 'texture_request_seconds'
+METRIC_CATEGORIES = ('cannabis', 'avatar', 'environment', 'materials', 'general', 'atlas')
+
+# Texture cache configuration (the disk tier lives outside the served assets tree)
+TEXTURE_CACHE_DIR = 'data/texture_cache'
+TEXTURE_CACHE_MEMORY_BYTES = int(os.environ.get('TEXTURE_CACHE_MEMORY_BYTES', 256 * 1024 * 1024))
+TEXTURE_CACHE_DISK_BYTES = int(os.environ.get('TEXTURE_CACHE_DISK_BYTES', 2 * 1024 * 1024 * 1024))
+
+# Resized asset variants (/assets/<path>?w=&fmt=&q=): widths round up to a power of two
+# (at least VARIANT_MIN_WIDTH, never above the source) and qualities to a multiple of
+# VARIANT_QUALITY_STEP, which bounds the variants of one asset; they are kept in a sharded
+# disk cache of at most TEXTURE_VARIANT_CACHE_BYTES, least recently served evicted first
+TEXTURE_VARIANT_DIR = 'assets/textures/ai_generated/variants'
+TEXTURE_VARIANT_CACHE_BYTES = int(os.environ.get('TEXTURE_VARIANT_CACHE_BYTES', 512 * 1024 * 1024))
+VARIANT_MIN_WIDTH = 32
+VARIANT_QUALITY_STEP = 5
+VARIANT_REDUCING_GAP = 2.0
+
+# Generated files live in a content-addressed blob store: named by the SHA-256 of their
+# bytes (identical outputs are stored once) under two levels of shard directories. A
+# background collector deletes the least recently accessed blobs nothing references
+# (baked presets are referenced) while the store exceeds TEXTURE_BLOB_QUOTA_BYTES,
+# sparing blobs accessed within the last BLOB_GC_GRACE seconds. The blob index lives
+# outside the served assets tree, in TEXTURE_BLOB_INDEX_DIR
+TEXTURE_BLOB_DIR = 'assets/textures/ai_generated/blobs'
+TEXTURE_BLOB_INDEX_DIR = os.environ.get('TEXTURE_BLOB_INDEX_DIR', 'data/texture_blobs')
+TEXTURE_BLOB_QUOTA_BYTES = int(os.environ.get('TEXTURE_BLOB_QUOTA_BYTES', 4 * 1024 * 1024 * 1024))
+BLOB_GC_INTERVAL = 60
+BLOB_GC_GRACE = 600
+
+# Idle full-resolution working buffers kept for reuse, per worker process
+TEXTURE_BUFFER_POOL_BYTES = int(os.environ.get('TEXTURE_BUFFER_POOL_BYTES', 256 * 1024 * 1024))
+
+# Texture job pool configuration
+TEXTURE_JOB_WORKERS = int(os.environ.get('TEXTURE_JOB_WORKERS', os.cpu_count() or 1))
+TEXTURE_JOB_QUEUE_DEPTH = int(os.environ.get('TEXTURE_JOB_QUEUE_DEPTH', 32))
+TEXTURE_JOB_TIMEOUT = float(os.environ.get('TEXTURE_JOB_TIMEOUT', 120))
+TEXTURE_JOB_MAX_WAIT = 30
+TEXTURE_FINALIZE_WORKERS = int(os.environ.get('TEXTURE_FINALIZE_WORKERS', 4))
+
+# Manifest of the preset textures pre-baked by bake_presets.py
+PRESET_MANIFEST_PATH = os.environ.get('TEXTURE_PRESET_MANIFEST', 'assets/textures/ai_generated/presets.json')
+
+# Single flight: lock stripes and published results shared by the service workers on
+# this host, so concurrent identical requests generate the texture once. Kept outside the
+# served assets tree: published results are texture payloads keyed by request digest
+TEXTURE_FLIGHT_DIR = os.environ.get('TEXTURE_FLIGHT_DIR', 'data/texture_flights')
+FLIGHT_LOCK_STRIPES = 4096
+
+# Admission control: uncached texture jobs are admitted while their estimated worker memory
+# and CPU time fit these budgets (CPU as queued seconds per job worker); other requests
+# wait up to TEXTURE_ADMISSION_WAIT seconds, then get 429 with Retry-After
+TEXTURE_ADMISSION_MEMORY_BYTES = int(os.environ.get('TEXTURE_ADMISSION_MEMORY_BYTES', 1024 * 1024 * 1024))
+TEXTURE_ADMISSION_CPU_SECONDS = float(os.environ.get('TEXTURE_ADMISSION_CPU_SECONDS', 30))
+TEXTURE_ADMISSION_WAIT = float(os.environ.get('TEXTURE_ADMISSION_WAIT', 2))
+TEXTURE_ADMISSION_MAX_WAITING = 64
+
+# Admission cost model, measured on one core: peak working memory per pixel of an
+# in-memory texture, the bound for a tiled one, and CPU seconds per megapixel by
+# category (other categories cost like 'general'); tiled bands cost a little more,
+# and deriving and encoding PBR maps adds its own memory and CPU per pixel
+ADMISSION_BYTES_PER_PIXEL = 24
+ADMISSION_TILED_BYTES = 64 * 1024 * 1024
+ADMISSION_CPU_PER_MEGAPIXEL = {
+    'cannabis': 0.19,
+    'avatar': 0.18,
+    'environment': 0.23,
+    'materials': 0.10,
+    'general': 0.10
+}
+ADMISSION_TILED_CPU_FACTOR = 1.3
+ADMISSION_MAPS_BYTES_PER_PIXEL = 40
+ADMISSION_MAPS_CPU_PER_MEGAPIXEL = 0.13
+
+# Variation sets (variants option): up to VARIANTS_MAX textures of one request built over
+# its kernel output less the per-pixel detail and, unless variant 0 clips, variant 0's
+# post-processing residual (see build_variants); each variant after the first costs
+# ADMISSION_VARIANT_CPU_SHARE of a full generation (0.25 to 0.45 measured at 1024px) and
+# the set ADMISSION_VARIANTS_BYTES_PER_PIXEL more memory than a single texture
+VARIANTS_MAX = 8
+ADMISSION_VARIANTS_BYTES_PER_PIXEL = 32
+ADMISSION_VARIANT_CPU_SHARE = 0.5
+
+# Cache lifetime for inline texture responses (output is deterministic per request)
+INLINE_TEXTURE_MAX_AGE = 86400
+
+# Batch generation limits
+TEXTURE_BATCH_MAX_SPECS = 32
+BATCH_MAX_PIXELS = 2048 * 2048
+
+# Texture atlases: tiles are packed into one power-of-two image of at most ATLAS_MAX_SIZE
+# per side, each inside ATLAS_PADDING pixels of wrapped border by default (a border of
+# 2^k pixels keeps k mip levels from blending in the neighbouring tiles); packing and
+# encoding an atlas costs ATLAS_CPU_PER_MEGAPIXEL seconds on top of its tiles
+ATLAS_MAX_SIZE = int(os.environ.get('TEXTURE_ATLAS_MAX_SIZE', 4096))
+ATLAS_PADDING = 8
+ATLAS_MAX_PADDING = 64
+ATLAS_CPU_PER_MEGAPIXEL = 0.025
+
+# Mip chain output: the 256 level doubles as the thumbnail
+THUMBNAIL_SIZE = 256
+MIP_MIN_SIZE = 64
+MIP_MAX_SIZE = 2048
+
+# PBR maps (maps option), derived from the albedo: normal map gradient scale, blur radius
+# for occlusion and roughness as a fraction of the resolution, occlusion depth and roughness
+# range; the procedural materials are all dielectrics, so metalness is 0
+PBR_MAP_NAMES = ('normal', 'height', 'orm')
+PBR_NORMAL_STRENGTH = 4.0
+PBR_BLUR_FRACTION = 1 / 128
+PBR_AO_STRENGTH = 0.6
+PBR_ROUGHNESS_RANGE = (0.45, 0.95)
+PBR_METALNESS = 0.0
+
+# Rows per band for the float32 enhancement passes (bounds temporaries to a few MB)
+BAND_ROWS = 128
+
+# Tiled generation: resolutions from TILED_MIN_RESOLUTION run in bands of about
+# TILE_PIXELS pixels (plus TILE_HALO overlap rows) into a disk-backed buffer. Buffers and
+# encodes are written in TILE_SCRATCH_DIR, outside the served assets tree (but on the same
+# filesystem, since finished encodes are moved into the blob store)
+TEXTURE_RESOLUTIONS = [512, 1024, 2048, 4096, 8192]
+TEXTURE_STYLES = ['photorealistic', 'artistic', 'cartoon', 'abstract']
+TILED_MIN_RESOLUTION = 4096
+TILE_PIXELS = int(os.environ.get('TEXTURE_TILE_PIXELS', 1024 * 1024))
+TILE_HALO = 2
+TILE_SCRATCH_DIR = 'data/texture_scratch'
+
+# Wood rings across the texture (an integer, so the grain tiles vertically)
+WOOD_RINGS = 32
+
+# Per-channel gain of the uniform noise each create_* kernel starts from: its per-pixel
+# detail, which variation sets redraw for every variant over the kernel's other output
+DETAIL_GAINS = {
+    'create_cannabis_texture': np.float32([0.2, 0.4, 0.2]),
+    'create_skin_texture': np.float32(0.15),
+    'create_soil_texture': np.float32([0.3, 0.2, 0.1]),
+    'create_wood_texture': np.float32([0.2, 0.2, 0.1]),
+    'create_generic_texture': np.float32(0.3)
+}
+
+# Category enhancement pass run before post-processing; other categories have none
+CATEGORY_ENHANCERS = {
+    'cannabis': 'enhance_cannabis_texture',
+    'avatar': 'enhance_skin_texture',
+    'environment': 'enhance_environment_texture'
+}
+
+# Seamless tiling for images that are not tileable by construction: 'blend' crossfades opposite
+# edges, 'offset' crossfades the edges with the image shifted by half its size,
+# 'mirror' reflects the top-left quadrant. Generated textures tile by construction (periodic
+# patterns), so no request path runs make_seamless and the mode is not configurable
+SEAMLESS_MODES = ('blend', 'offset', 'mirror')
+SEAMLESS_MODE = 'blend'
+
+# Edge strips are blended in chunks of about this many pixels, small enough
+# for the int16 working copies to stay in cache
+SEAM_CHUNK_PIXELS = 32 * 1024
+
+# Post-processing factors, matching ImageEnhance Sharpness/Contrast/Color
+SHARPNESS_FACTOR = 1.2
+CONTRAST_FACTOR = 1.1
+COLOR_FACTOR = 1.05
+
+# Sharpness blends towards PIL's SMOOTH filter (1 1 1 / 1 5 1 / 1 1 1, scale 13);
+# folded together that is a weighted sum of the pixel and its 3x3 box sum
+SHARPEN_BOX_WEIGHT = -(SHARPNESS_FACTOR - 1) / 13
+SHARPEN_CENTER_WEIGHT = SHARPNESS_FACTOR - (SHARPNESS_FACTOR - 1) * 4 / 13
+
+# Away from clipping, contrast then color map the difference of two pixels through this
+# matrix (Rec. 601 luma for the gray); variation sets finish their later variants with it
+POST_COLOR_MATRIX = np.float32(CONTRAST_FACTOR * (COLOR_FACTOR * np.eye(3) + (1 - COLOR_FACTOR) * LUMA_WEIGHTS))
 
 class HyperRealisticTextureGenerator:
     def __init__(self):
         """Initialize the enhanced texture generator with multiple AI models"""
         self.device = "cpu"  # Default to CPU for broader compatibility
         self.models = {}
-        self.texture_cache = {}
         
         # Enhanced cannabis-specific prompts for hyper-realism
         self.cannabis_prompts = {
@@ -79,10 +279,29 @@ class HyperRealisticTextureGenerator:
         # Create necessary directories
         self.ensure_directories()
         
+        # Encoded texture cache (memory + disk)
+        self.texture_cache = TextureCache(
+            memory_budget=TEXTURE_CACHE_MEMORY_BYTES,
+            disk_dir=TEXTURE_CACHE_DIR,
+            disk_budget=TEXTURE_CACHE_DISK_BYTES
+        )
+        
+        # Working arrays borrowed by the pipeline stages
+        self.buffer_pool = BufferPool(max_bytes=TEXTURE_BUFFER_POOL_BYTES)
+        
+    def preset_prompts(self):
+        """Preset prompts by group; each group name is also the category its presets are generated in"""
+        return {
+            'cannabis': self.cannabis_prompts,
+            'avatar': self.avatar_prompts,
+            'environment': self.environment_prompts
+        }
+        
     def ensure_directories(self):
         """Create necessary directories for texture storage"""
         directories = [
             'assets/textures/ai_generated',
+            TILE_SCRATCH_DIR,
             'assets/textures/materials',
             'assets/textures/avatars',
             'assets/textures/environments',
@@ -95,25 +314,530 @@ class HyperRealisticTextureGenerator:
     def generate_texture(self, prompt, style="photorealistic", resolution=1024, category="general"):
         """Generate AI texture with enhanced post-processing"""
         try:
-            # Enhance prompt based on category and style
-            enhanced_prompt = self.enhance_prompt(prompt, style, category)
+            return self.build_texture(prompt, style, resolution, category)
             
-            # For demo purposes, create a procedural texture
-            # In production, this would call actual AI models like Stable Diffusion
-            texture = self.create_procedural_texture(enhanced_prompt, resolution)
+        except Exception as e:
+            logger.error(f"Error generating texture: {str(e)}")
+            return self.create_fallback_texture(resolution)
             
-            # Apply post-processing for hyper-realism
-            processed_texture = self.post_process_texture(texture, category)
+    def build_texture(self, prompt, style, resolution, category):
+        """Run the texture pipeline, raising on failure"""
+        # Enhance prompt based on category and style
+        enhanced_prompt = self.enhance_prompt(prompt, style, category)
+        
+        # For demo purposes, create a procedural texture
+        # In production, this would call actual AI models like Stable Diffusion
+        # Every random draw comes from a noise field seeded by the request digest,
+        # so the same request yields identical bytes in every worker
+        noise_field = new_noise_field(texture_seed(prompt, style, resolution, category))
+        with metrics.labels(**metric_labels(resolution, category)):
+            img_array = self.create_procedural_array(enhanced_prompt, resolution, noise_field)
+            try:
+                with metrics.timer(STAGE_SECONDS, stage='post_process'):
+                    return self.finish_texture(img_array, category, noise_field)
+            finally:
+                self.buffer_pool.release(img_array)
+        
+    def build_texture_tiled(self, prompt, style, resolution, category, out):
+        """Run the texture pipeline in bands of rows, writing uint8 RGB pixels into out
+        
+        out is a (resolution, resolution, 3) uint8 array, normally a np.memmap,
+        so peak memory follows TILE_PIXELS rather than the output size. Bands
+        overlap by TILE_HALO rows to feed the 3x3 blur and sharpen filters, and
+        the global mean the contrast step needs is gathered before the final
+        pass, so the result is pixel-identical to build_texture.
+        """
+        enhanced_prompt = self.enhance_prompt(prompt, style, category)
+        noise_field = new_noise_field(texture_seed(prompt, style, resolution, category))
+        kernel = self.select_texture_kernel(enhanced_prompt)
+        band_rows = max(1, TILE_PIXELS // resolution)
+        clock = StageClock()
+        
+        # Pass 1: base texture and category enhancement
+        for band in row_bands(resolution, band_rows):
+            start = max(0, band.start - TILE_HALO)
+            stop = min(resolution, band.stop + TILE_HALO)
+            
+            with clock.stage('noise'):
+                noise = noise_field.uniform(start, stop, resolution)
+            with clock.stage('kernel'):
+                texture = kernel(noise, resolution, noise_field, row_offset=start)
+                texture *= 255
+            with clock.stage('post_process'):
+                img_array = self.enhance_category_texture(texture.astype(np.uint8), category, noise_field, row_offset=start)
+                out[band] = img_array[band.start - start:band.stop - start]
+                
+        with clock.stage('post_process'):
+            # Pass 2: luminance mean of the sharpened image
+            row_sums = [self.luminance_rows(self.sharpen_band(out, band)) for band in row_bands(resolution, band_rows)]
+            mean = math.fsum(np.concatenate(row_sums)) / (resolution * resolution)
             
-            # Make seamless if needed
-            if category in ['materials', 'environments']:
-                processed_texture = self.make_seamless(processed_texture)
+            # Pass 3: sharpen, contrast and color in place; the row above each band
+            # is kept from before it was overwritten
+            above = None
+            for band in row_bands(resolution, band_rows):
+                work = self.sharpen_band(out, band, above)
+                above = np.array(out[band.stop - 1])
+                out[band] = self.contrast_color_texture(work, mean)
                 
-            return processed_texture
+        metrics.observe_clock(STAGE_SECONDS, clock, **metric_labels(resolution, category))
+        return out
+        
+    def build_variants(self, prompt, style, resolution, category, count):
+        """Yield count variants of a texture, built one at a time over a shared base
+        
+        Variant 0 is the request's own texture, identical to build_texture.
+        The kernel runs once, for variant 0, and its output less the kernel's
+        per-pixel detail (see DETAIL_GAINS) is the base: the prompt's colors,
+        pattern layers and masks. Every other variant adds fresh detail from
+        its VariantNoiseField to the base and runs the category enhancement
+        and post-processing with that field, or, when no value of variant 0
+        clips, finishes over variant 0's residual (see start_linear_variants),
+        which for categories without an enhancement leaves only the detail to
+        redraw (finish_detail).
+        """
+        enhanced_prompt = self.enhance_prompt(prompt, style, category)
+        seed = texture_seed(prompt, style, resolution, category)
+        gain = DETAIL_GAINS[self.select_texture_kernel(enhanced_prompt).__name__] * np.float32(255)
+        noise_field = new_noise_field(seed)
+        shape = (resolution, resolution, 3)
+        base = enhanced = residual = None
+        if count > 1:
+            base = self.buffer_pool.acquire(shape, np.float32)
+            enhanced = self.buffer_pool.acquire(shape, np.uint8)
+        try:
+            for variant in range(count):
+                with metrics.labels(**metric_labels(resolution, category)):
+                    if variant:
+                        noise_field = VariantNoiseField(seed, variant)
+                    if variant and base is None:
+                        # The residual already holds the base (see start_linear_variants)
+                        texture = self.finish_detail(residual, gain, noise_field)
+                    else:
+                        if variant:
+                            img_array = self.add_detail(base, gain, noise_field)
+                        else:
+                            img_array = self.create_procedural_array(enhanced_prompt, resolution, noise_field, noise_out=base)
+                            if base is not None and category in CATEGORY_ENHANCERS:
+                                self.remove_detail(base, gain, img_array)
+                        try:
+                            with metrics.timer(STAGE_SECONDS, stage='post_process'):
+                                if residual is None:
+                                    texture = self.finish_texture(img_array, category, noise_field, enhanced_out=enhanced)
+                                else:
+                                    texture = self.finish_variant(img_array, category, noise_field, residual)
+                            if enhanced is not None:
+                                residual = self.start_linear_variants(category, enhanced, img_array, base, gain)
+                                self.buffer_pool.release(enhanced)
+                                enhanced = None
+                                if residual is not None and category not in CATEGORY_ENHANCERS:
+                                    self.buffer_pool.release(base)
+                                    base = None
+                        finally:
+                            self.buffer_pool.release(img_array)
+                yield texture
+        finally:
+            for array in (base, enhanced, residual):
+                if array is not None:
+                    self.buffer_pool.release(array)
+        
+    def remove_detail(self, noise, gain, img_array):
+        """Turn the uniform noise behind a uint8 kernel output into the float32 output less its detail, gain (in levels) times the noise"""
+        import cv2
+        
+        with metrics.timer(STAGE_SECONDS, stage='kernel'):
+            # Less half a level: add_detail rounds where the kernel path truncates
+            affine_channels(noise, -gain, np.float32(-0.5))
+            cv2.add(noise, img_array, dst=noise, dtype=cv2.CV_32F)
+        return noise
+        
+    def add_detail(self, base, gain, noise_field):
+        """base plus gain times noise_field's uniform noise, as a uint8 array borrowed from the buffer pool"""
+        import cv2
+        
+        shape = base.shape
+        with metrics.timer(STAGE_SECONDS, stage='noise'):
+            detail = noise_field.uniform(0, shape[0], shape[1], out=self.buffer_pool.acquire(shape, np.float32))
+        try:
+            with metrics.timer(STAGE_SECONDS, stage='kernel'):
+                affine_channels(detail, gain)
+                img_array = self.buffer_pool.acquire(shape, np.uint8)
+                cv2.add(detail, base, dst=img_array, dtype=cv2.CV_8U)
+        finally:
+            self.buffer_pool.release(detail)
             
+        return img_array
+        
+    def start_linear_variants(self, category, enhanced, finished, base, gain):
+        """Variant 0's residual for finish_variant or finish_detail, in a pooled float32 array, or None
+        
+        Sharpening is linear and contrast and color are linear away from
+        clipping, so the residual, finished less the linear part of
+        post_process_array (sharpening weights, POST_COLOR_MATRIX) applied to
+        enhanced, plus that of a later variant's enhanced array, is within a
+        few levels of that variant's full post-processing. None when finished
+        clips.
+        
+        For categories without an enhancement, enhanced is the kernel output
+        and base still holds the uniform noise behind it (build_variants
+        leaves remove_detail to this method): the residual takes out the base
+        as well, gain times the noise plus half a level, so that later
+        variants need only their detail, and base becomes the base only if
+        finished clips.
+        """
+        import cv2
+        
+        if has_extreme_levels(finished):
+            if category not in CATEGORY_ENHANCERS:
+                self.remove_detail(base, gain, enhanced)
+            return None
+            
+        residual = self.buffer_pool.acquire(finished.shape, np.float32)
+        if category in CATEGORY_ENHANCERS:
+            self.sharpen_unrounded(enhanced, out=residual)
+            cv2.transform(residual, POST_COLOR_MATRIX, dst=residual)
+        else:
+            self.sharpen_unrounded(base, out=residual)
+            scale = POST_COLOR_MATRIX * gain
+            cv2.transform(residual, np.hstack([scale, POST_COLOR_MATRIX.sum(axis=1, keepdims=True) * np.float32(0.5)]), dst=residual)
+        return cv2.subtract(finished, residual, dst=residual, dtype=cv2.CV_32F)
+        
+    def finish_variant(self, img_array, category, noise_field, residual):
+        """Finish a later variant of a variation set over variant 0's residual (see start_linear_variants)
+        
+        Runs the category enhancement on img_array, then the linear part of
+        post_process_array (sharpening weights, POST_COLOR_MATRIX), and adds
+        the residual. The result overwrites img_array.
+        """
+        import cv2
+        
+        img_array = self.enhance_category_texture(img_array, category, noise_field)
+        with self.buffer_pool.borrow(img_array.shape, np.float32) as work:
+            self.sharpen_unrounded(img_array, out=work)
+            cv2.transform(work, POST_COLOR_MATRIX, dst=work)
+            cv2.add(residual, work, dst=img_array, dtype=cv2.CV_8U)
+        
+        return Image.fromarray(img_array)
+        
+    def finish_detail(self, residual, gain, noise_field):
+        """A later variant of a variation set without category enhancement, from its detail alone
+        
+        The residual (see start_linear_variants) plus the linear part of
+        post_process_array applied to gain times noise_field's uniform noise,
+        a band of rows (and one neighbour row either side) at a time. The
+        noise is sharpened as its uint8 levels (VariantNoiseField.levels); the
+        matrix folds in their scale to uniform values and, as sharpening keeps
+        constants, their offset.
+        """
+        import cv2
+        
+        height, width = residual.shape[:2]
+        scale = POST_COLOR_MATRIX * (gain / np.float32(256))
+        matrix = np.hstack([scale, scale.sum(axis=1, keepdims=True) * np.float32(0.5)])
+        with self.buffer_pool.borrow(residual.shape, np.uint8) as img_array:
+            with metrics.timer(STAGE_SECONDS, stage='post_process'):
+                for band in row_bands(height):
+                    start = max(0, band.start - 1)
+                    stop = min(height, band.stop + 1)
+                    work = self.sharpen_unrounded(noise_field.levels(start, stop, width))
+                    work = work[band.start - start:band.stop - start]
+                    cv2.transform(work, matrix, dst=work)
+                    cv2.add(residual[band], work, dst=img_array[band], dtype=cv2.CV_8U)
+            return Image.fromarray(img_array)
+        
+    def build_textures(self, specs):
+        """Run the texture pipeline for a list of (prompt, style, resolution, category) specs
+        
+        Specs sharing a resolution and base kernel draw their noise into one
+        (N, H, W, 3) buffer and run the create_* kernel once over the batch.
+        Each texture keeps its own seeded noise field, so every result is
+        identical to build_texture for the same spec.
+        """
+        groups = {}
+        for index, (prompt, style, resolution, category) in enumerate(specs):
+            kernel = self.select_texture_kernel(self.enhance_prompt(prompt, style, category))
+            groups.setdefault((resolution, kernel), []).append(index)
+            
+        textures = [None] * len(specs)
+        for (resolution, kernel), indices in groups.items():
+            # Bound each batch buffer to BATCH_MAX_PIXELS
+            batch_size = max(1, BATCH_MAX_PIXELS // (resolution * resolution))
+            for start in range(0, len(indices), batch_size):
+                batch = indices[start:start + batch_size]
+                noise_fields = [new_noise_field(texture_seed(*specs[i])) for i in batch]
+                
+                shape = (len(batch), resolution, resolution, 3)
+                clock = StageClock()
+                noise = self.buffer_pool.acquire(shape, np.float32)
+                try:
+                    with clock.stage('noise'):
+                        for noise_field, out in zip(noise_fields, noise):
+                            noise_field.uniform(0, resolution, resolution, out=out)
+                            
+                    with clock.stage('kernel'):
+                        texture = kernel(noise, resolution, noise_fields)
+                        texture *= 255
+                        texture_uint8 = self.buffer_pool.acquire(shape, np.uint8)
+                        np.copyto(texture_uint8, texture, casting='unsafe')
+                        del texture
+                finally:
+                    self.buffer_pool.release(noise)
+                    
+                # Batch-wide stages count as an equal share of their time for each texture
+                for stage, seconds in clock.seconds.items():
+                    for i in batch:
+                        metrics.observe(STAGE_SECONDS, seconds / len(batch), stage=stage,
+                                        **metric_labels(resolution, specs[i][3]))
+                        
+                # Category enhancements draw from each texture's own noise field
+                try:
+                    for i, noise_field, image in zip(batch, noise_fields, texture_uint8):
+                        with metrics.timer(STAGE_SECONDS, stage='post_process', **metric_labels(resolution, specs[i][3])):
+                            textures[i] = self.finish_texture(image, specs[i][3], noise_field)
+                finally:
+                    self.buffer_pool.release(texture_uint8)
+                    
+        return textures
+        
+    def finish_texture(self, img_array, category, noise_field, enhanced_out=None):
+        """Post-process a uint8 base texture array in place and return it as a PIL image
+        
+        The procedural patterns are periodic, so every texture already tiles
+        and no make_seamless pass is needed. enhanced_out is passed on to
+        post_process_array.
+        """
+        # Apply post-processing for hyper-realism
+        return Image.fromarray(self.post_process_array(img_array, category, noise_field, enhanced_out))
+        
+    def render_texture(self, prompt, style="photorealistic", resolution=1024, category="general", options=None):
+        """Return the encoded outputs dict for a texture, served from the texture cache when possible"""
+        cached = self.get_cached_texture(prompt, style, resolution, category, options)
+        if cached is not None:
+            return cached
+            
+        outputs, cacheable = self.encode_texture(prompt, style, resolution, category, options)
+        if cacheable:
+            self.cache_texture(prompt, style, resolution, category, outputs, options)
+            
+        return outputs
+        
+    def output_names(self, resolution, options=None):
+        """Names of the encoded outputs produced for a request"""
+        names = ['texture', 'thumbnail']
+        if (options or {}).get('levels'):
+            names += [f"mip_{size}" for size in mip_sizes(resolution) if size != THUMBNAIL_SIZE]
+        if (options or {}).get('maps'):
+            names += list(PBR_MAP_NAMES)
+        return names + [f"variant{variant}_{name}" for variant in range(1, variant_count(options)) for name in names]
+        
+    def get_cached_texture(self, prompt, style, resolution, category, options=None):
+        """Return the cached outputs dict if every requested output is cached, else None"""
+        key = texture_key(prompt, style, resolution, category) + (output_format(options),)
+        outputs = {}
+        for name in self.output_names(resolution, options):
+            data = self.texture_cache.get(key + (name,))
+            if data is None:
+                metrics.inc('texture_cache_lookups_total', result='miss')
+                return None
+            outputs[name] = data
+        metrics.inc('texture_cache_lookups_total', result='hit')
+        return outputs
+        
+    def cache_texture(self, prompt, style, resolution, category, outputs, options=None):
+        """Store every encoded output in the cache, keyed per format"""
+        key = texture_key(prompt, style, resolution, category) + (output_format(options),)
+        for name, data in outputs.items():
+            self.texture_cache.put(key + (name,), data)
+        
+    def get_cached_pixels(self, prompt, style, resolution, category):
+        """A cached PNG encoding of a texture (its pixels equal a fresh render), or None"""
+        return self.texture_cache.get(texture_key(prompt, style, resolution, category) + ('png', 'texture'))
+        
+    def get_cached_atlas(self, specs, padding, options=None):
+        """Return the cached outputs of an atlas of specs (in packing order), or None"""
+        key = atlas_key(specs, padding, options)
+        outputs = {}
+        for name in ('texture', 'thumbnail'):
+            data = self.texture_cache.get(key + (name,))
+            if data is None:
+                metrics.inc('texture_cache_lookups_total', result='miss')
+                return None
+            outputs[name] = data
+        metrics.inc('texture_cache_lookups_total', result='hit')
+        return outputs
+        
+    def cache_atlas(self, specs, padding, outputs, options=None):
+        key = atlas_key(specs, padding, options)
+        for name, data in outputs.items():
+            self.texture_cache.put(key + (name,), data)
+            
+    def encode_texture(self, prompt, style, resolution, category, options=None):
+        """Generate and encode a texture without consulting the cache
+        
+        Returns (outputs, cacheable); fallback textures are not cacheable so
+        the next request retries generation.
+        """
+        with metrics.labels(**metric_labels(resolution, category)):
+            if resolution >= TILED_MIN_RESOLUTION:
+                return self.encode_texture_tiled(prompt, style, resolution, category, options), False
+            if variant_count(options) > 1:
+                return self.encode_variants(prompt, style, resolution, category, options)
+                
+            try:
+                texture = self.build_texture(prompt, style, resolution, category)
+                cacheable = True
+            except Exception as e:
+                logger.error(f"Error generating texture: {str(e)}")
+                texture = self.create_fallback_texture(resolution)
+                cacheable = False
+                
+            return self.encode_outputs(texture, options), cacheable
+        
+    def encode_variants(self, prompt, style, resolution, category, options=None):
+        """Generate and encode the variants option's variation set, as (outputs, cacheable)
+        
+        Variant 0's outputs keep their names, so they are those of the
+        request without variants; variant k's are prefixed with 'variant<k>_'
+        and encoded with the profile's variation_params. On failure every
+        variant is the fallback texture.
+        """
+        outputs = {}
+        try:
+            for variant, texture in enumerate(self.build_variants(prompt, style, resolution, category, variant_count(options))):
+                prefix = f"variant{variant}_" if variant else ''
+                params = 'variation_params' if variant else 'params'
+                outputs.update((prefix + name, data) for name, data in self.encode_outputs(texture, options, params).items())
+            return outputs, True
         except Exception as e:
-            logger.error(f"Error generating texture: {str(e)}")
-            return self.create_fallback_texture(resolution)
+            logger.error(f"Error generating texture variants: {str(e)}")
+            fallback = self.encode_outputs(self.create_fallback_texture(resolution), options)
+            outputs = dict(fallback)
+            for variant in range(1, variant_count(options)):
+                outputs.update((f"variant{variant}_{name}", data) for name, data in fallback.items())
+            return outputs, False
+            
+    def encode_texture_tiled(self, prompt, style, resolution, category, options=None):
+        """Generate and encode a texture too large to hold in memory
+        
+        Pixels go through a disk-backed buffer and the encoder streams them to
+        a scratch file named by outputs['texture_file'], which save_texture
+        moves into place. Thumbnail and mip levels (at most MIP_MAX_SIZE) are
+        encoded in memory as usual. Errors propagate: there is no fallback
+        texture at these sizes.
+        """
+        fmt = output_format(options)
+        profile = get_profile(fmt)
+        band_rows = max(1, TILE_PIXELS // resolution)
+        buffer_path, pixels = open_pixel_buffer(resolution, TILE_SCRATCH_DIR)
+        texture_file = scratch_file(TILE_SCRATCH_DIR, fmt)
+        outputs = {'texture_file': texture_file}
+        try:
+            self.build_texture_tiled(prompt, style, resolution, category, pixels)
+            with metrics.timer(STAGE_SECONDS, stage='reduce'):
+                largest = Image.fromarray(box_reduce(pixels, resolution // MIP_MAX_SIZE, band_rows))
+                if (options or {}).get('levels'):
+                    outputs[f"mip_{MIP_MAX_SIZE}"] = encode_image(largest, profile['pil_format'], **profile['thumbnail_params'])
+            with metrics.timer(STAGE_SECONDS, stage='encode'):
+                write_image(pixels, texture_file, fmt, band_rows, **profile['params'])
+        except Exception:
+            os.remove(texture_file)
+            raise
+        finally:
+            del pixels
+            os.remove(buffer_path)
+            
+        outputs.update(self.encode_levels(largest, options))
+        return outputs
+        
+    def encode_textures(self, specs, options=None):
+        """Batched encode_texture: one (outputs, cacheable) per spec
+        
+        Tiled resolutions are generated one at a time outside the batch.
+        """
+        batched = [i for i, spec in enumerate(specs) if spec[2] < TILED_MIN_RESOLUTION]
+        results = [None] * len(specs)
+        try:
+            textures = self.build_textures([specs[i] for i in batched])
+        except Exception as e:
+            logger.error(f"Error generating texture batch: {str(e)}")
+            return [self.encode_texture(*spec, options) for spec in specs]
+            
+        for i, texture in zip(batched, textures):
+            with metrics.labels(**metric_labels(specs[i][2], specs[i][3])):
+                results[i] = (self.encode_outputs(texture, options), True)
+        for i, spec in enumerate(specs):
+            if results[i] is None:
+                results[i] = self.encode_texture(*spec, options)
+                
+        return results
+        
+    def encode_atlas(self, specs, layout, padding, options=None, cached=None):
+        """Generate specs as one batch, pack them into an atlas and encode it
+        
+        layout is pack_atlas()'s (width, height, positions) for the specs;
+        cached maps spec indexes to PNG textures from the cache, which are
+        decoded instead of generated. Returns (outputs, cacheable).
+        """
+        width, height, positions = layout
+        cached = cached or {}
+        textures = {i: Image.open(io.BytesIO(data)).convert('RGB') for i, data in cached.items()}
+        pending = [i for i in range(len(specs)) if i not in cached]
+        cacheable = True
+        try:
+            textures.update(zip(pending, self.build_textures([specs[i] for i in pending])))
+        except Exception as e:
+            logger.error(f"Error generating atlas textures: {str(e)}")
+            textures.update((i, self.create_fallback_texture(specs[i][2])) for i in pending)
+            cacheable = False
+            
+        with metrics.labels(**metric_labels(width, 'atlas')):
+            with metrics.timer(STAGE_SECONDS, stage='pack'):
+                atlas = np.zeros((height, width, 3), np.uint8)
+                for i, (x, y) in enumerate(positions):
+                    blit_wrapped(atlas, np.asarray(textures.pop(i)), x, y, padding)
+                atlas = Image.fromarray(atlas)
+            return self.encode_outputs(atlas, options), cacheable
+            
+    def encode_outputs(self, texture, options=None, params='params'):
+        """Encode a texture, its thumbnail, and its mip chain and PBR maps with the levels and maps options
+        
+        Each level is a 2x box reduction of the previous one; the 256 level
+        doubles as the thumbnail. The format option selects the encoder profile
+        and params which of its save() parameters encode the texture.
+        """
+        profile = get_profile(output_format(options))
+        with metrics.timer(STAGE_SECONDS, stage='encode'):
+            outputs = {'texture': encode_image(texture, profile['pil_format'], **profile[params])}
+        outputs.update(self.encode_levels(texture, options))
+        if (options or {}).get('maps'):
+            outputs.update(self.encode_maps(texture, options))
+        return outputs
+        
+    def encode_maps(self, texture, options=None):
+        """Derive the height, normal and ORM maps of a texture and encode them like the texture"""
+        profile = get_profile(output_format(options))
+        with metrics.timer(STAGE_SECONDS, stage='maps'):
+            maps = derive_pbr_maps(np.asarray(texture), PBR_NORMAL_STRENGTH, max(1, round(texture.width * PBR_BLUR_FRACTION)),
+                                   PBR_AO_STRENGTH, PBR_ROUGHNESS_RANGE, PBR_METALNESS)
+            return {name: encode_image(Image.fromarray(maps[name]), profile['pil_format'], **profile['params'])
+                    for name in PBR_MAP_NAMES}
+        
+    def encode_levels(self, level, options=None):
+        """Encode the thumbnail and (with the levels option) the mip levels below an image"""
+        levels = (options or {}).get('levels')
+        profile = get_profile(output_format(options))
+        outputs = {}
+        
+        smallest = MIP_MIN_SIZE if levels else THUMBNAIL_SIZE
+        with metrics.timer(STAGE_SECONDS, stage='thumbnail'):
+            while level.width > smallest:
+                level = level.reduce(2)
+                if level.width == THUMBNAIL_SIZE:
+                    outputs['thumbnail'] = encode_image(level, profile['pil_format'], **profile['thumbnail_params'])
+                elif levels:
+                    outputs[f"mip_{level.width}"] = encode_image(level, profile['pil_format'], **profile['thumbnail_params'])
+                    
+        return outputs
             
     def enhance_prompt(self, prompt, style, category):
         """Enhance the prompt with style and category-specific terms"""
@@ -139,190 +863,351 @@ class HyperRealisticTextureGenerator:
         
         return enhanced
         
-    def create_procedural_texture(self, prompt, resolution):
+    def create_procedural_texture(self, prompt, resolution, noise_field):
         """Create a procedural texture based on the prompt (demo implementation)"""
+        img_array = self.create_procedural_array(prompt, resolution, noise_field)
+        try:
+            return Image.fromarray(img_array)
+        finally:
+            self.buffer_pool.release(img_array)
+            
+    def create_procedural_array(self, prompt, resolution, noise_field, noise_out=None):
+        """Create a procedural texture as a uint8 array borrowed from the buffer pool
+        
+        The caller releases the array back to self.buffer_pool. noise_out, if
+        given, receives a copy of the uniform noise the kernel consumes.
+        """
         # This is a simplified procedural generation for demo purposes
         # In production, this would interface with actual AI models
         
-        # Create base noise texture
-        np.random.seed(hash(prompt) % 2**32)
-        noise = np.random.rand(resolution, resolution, 3)
+        # Create base noise texture (float32; the create_* kernels reuse it in place)
+        shape = (resolution, resolution, 3)
+        with metrics.timer(STAGE_SECONDS, stage='noise'):
+            noise = noise_field.uniform(0, resolution, resolution, out=self.buffer_pool.acquire(shape, np.float32))
+            if noise_out is not None:
+                np.copyto(noise_out, noise)
+        try:
+            with metrics.timer(STAGE_SECONDS, stage='kernel'):
+                texture = self.select_texture_kernel(prompt)(noise, resolution, noise_field)
+                texture *= 255
+                img_array = self.buffer_pool.acquire(shape, np.uint8)
+                np.copyto(img_array, texture, casting='unsafe')
+        finally:
+            self.buffer_pool.release(noise)
+            
+        return img_array
+        
+    def select_texture_kernel(self, prompt):
+        """Pick the create_* kernel for a prompt
         
+        Kernels take noise shaped (..., H, W, 3), optionally with leading batch
+        axes, and overwrite it in place. row_offset is the image row of the
+        first noise row when generating a band. Structure comes from the
+        periodic fbm/worley patterns, so the result tiles by construction.
+        """
         # Apply different patterns based on prompt keywords
         if 'cannabis' in prompt.lower() or 'bud' in prompt.lower():
             # Create cannabis-like texture with green tones
-            texture = self.create_cannabis_texture(noise, resolution)
+            return self.create_cannabis_texture
         elif 'skin' in prompt.lower() or 'avatar' in prompt.lower():
             # Create skin-like texture
-            texture = self.create_skin_texture(noise, resolution)
+            return self.create_skin_texture
         elif 'soil' in prompt.lower() or 'earth' in prompt.lower():
             # Create soil texture
-            texture = self.create_soil_texture(noise, resolution)
+            return self.create_soil_texture
         elif 'wood' in prompt.lower():
             # Create wood texture
-            texture = self.create_wood_texture(noise, resolution)
+            return self.create_wood_texture
         else:
             # Generic material texture
-            texture = self.create_generic_texture(noise, resolution)
+            return self.create_generic_texture
             
-        # Convert to PIL Image
-        texture_uint8 = (texture * 255).astype(np.uint8)
-        return Image.fromarray(texture_uint8)
+    def apply_pattern(self, target, noise_field, row_offset, pattern, scale, **params):
+        """Add scale * pattern(seed, rows, width) to target, a band of rows at a time
+        
+        target is shaped (..., H, W) or (..., H, W, 3); with leading batch axes
+        noise_field is the list of per-image noise fields.
+        """
+        noise_fields = noise_field if isinstance(noise_field, list) else [noise_field]
+        channels = target.ndim - isinstance(noise_field, list) == 3
+        images = target.reshape((len(noise_fields),) + target.shape[-3 if channels else -2:])
+        
+        for image, field in zip(images, noise_fields):
+            for band in row_bands(image.shape[0]):
+                values = field.pattern(pattern, row_offset + band.start, row_offset + band.stop, image.shape[1], **params)
+                if channels:
+                    values = values[..., np.newaxis]
+                image[band] += values * scale
+                
+        return target
+        
+    def create_cannabis_texture(self, noise, resolution, noise_field, row_offset=0):
+        """Create cannabis bud-like texture (overwrites noise)"""
+        sparkle_mask = noise[..., 0] > 0.8
         
-    def create_cannabis_texture(self, noise, resolution):
-        """Create cannabis bud-like texture"""
         # Green color base
-        texture = np.zeros((resolution, resolution, 3))
-        texture[:, :, 1] = 0.3 + noise[:, :, 1] * 0.4  # Green channel
-        texture[:, :, 0] = 0.1 + noise[:, :, 0] * 0.2  # Red channel
-        texture[:, :, 2] = 0.1 + noise[:, :, 2] * 0.2  # Blue channel
+        texture = noise
+        affine_channels(texture, DETAIL_GAINS['create_cannabis_texture'], np.float32([0.1, 0.3, 0.1]))
+        
+        # Calyx clusters: cellular noise darkens towards the cell borders
+        self.apply_pattern(texture, noise_field, row_offset, worley, np.float32([-0.08, -0.16, -0.08]), period=32)
         
         # Add trichome-like sparkles
-        sparkle_mask = noise[:, :, 0] > 0.8
         texture[sparkle_mask] = [0.9, 0.9, 0.7]  # Golden sparkles
         
         return texture
         
-    def create_skin_texture(self, noise, resolution):
-        """Create realistic skin texture"""
+    def create_skin_texture(self, noise, resolution, noise_field, row_offset=0):
+        """Create realistic skin texture (overwrites noise)"""
+        pore_mask = noise[..., 0] < 0.1
+        
         # Skin tone base
-        texture = np.zeros((resolution, resolution, 3))
-        texture[:, :, 0] = 0.8 + noise[:, :, 0] * 0.15  # Red
-        texture[:, :, 1] = 0.6 + noise[:, :, 1] * 0.15  # Green
-        texture[:, :, 2] = 0.4 + noise[:, :, 2] * 0.15  # Blue
+        texture = noise
+        affine_channels(texture, DETAIL_GAINS['create_skin_texture'], np.float32([0.8, 0.6, 0.4]))
+        
+        # Soft blotches of tone
+        self.apply_pattern(texture, noise_field, row_offset, fbm, np.float32([0.06, 0.04, 0.03]), period=4)
         
         # Add subtle pore details
-        pore_mask = noise[:, :, 0] < 0.1
-        texture[pore_mask] *= 0.9
+        texture[pore_mask] *= np.float32(0.9)
         
         return texture
         
-    def create_soil_texture(self, noise, resolution):
-        """Create soil texture"""
+    def create_soil_texture(self, noise, resolution, noise_field, row_offset=0):
+        """Create soil texture (overwrites noise)"""
         # Brown soil base
-        texture = np.zeros((resolution, resolution, 3))
-        texture[:, :, 0] = 0.3 + noise[:, :, 0] * 0.3  # Red
-        texture[:, :, 1] = 0.2 + noise[:, :, 1] * 0.2  # Green
-        texture[:, :, 2] = 0.1 + noise[:, :, 2] * 0.1  # Blue
+        texture = noise
+        affine_channels(texture, DETAIL_GAINS['create_soil_texture'], np.float32([0.3, 0.2, 0.1]))
+        
+        # Clumps and pebbles
+        self.apply_pattern(texture, noise_field, row_offset, fbm, np.float32([0.12, 0.09, 0.05]), period=4, octaves=5)
+        self.apply_pattern(texture, noise_field, row_offset, worley, np.float32([-0.06, -0.05, -0.03]), period=64)
         
         return texture
         
-    def create_wood_texture(self, noise, resolution):
-        """Create wood grain texture"""
+    def create_wood_texture(self, noise, resolution, noise_field, row_offset=0):
+        """Create wood grain texture (overwrites noise)"""
+        # Wood grain pattern: WOOD_RINGS ring phases down the texture, warped by fbm
+        grain = noise[..., 0] * np.float32(2)
+        rows = np.arange(row_offset, row_offset + noise.shape[-3], dtype=np.float32)
+        grain += (rows * np.float32(2 * np.pi * WOOD_RINGS / resolution))[:, np.newaxis]
+        self.apply_pattern(grain, noise_field, row_offset, fbm, np.float32(6), period=2, octaves=3)
+        np.sin(grain, out=grain)
+        grain *= np.float32(0.1)
+        
         # Wood color base
-        texture = np.zeros((resolution, resolution, 3))
-        texture[:, :, 0] = 0.6 + noise[:, :, 0] * 0.2  # Red
-        texture[:, :, 1] = 0.4 + noise[:, :, 1] * 0.2  # Green
-        texture[:, :, 2] = 0.2 + noise[:, :, 2] * 0.1  # Blue
-        
-        # Add wood grain pattern
-        x = np.arange(resolution)
-        y = np.arange(resolution)
-        X, Y = np.meshgrid(x, y)
-        grain = np.sin(Y * 0.1 + noise[:, :, 0] * 2) * 0.1
-        texture += grain[:, :, np.newaxis]
-        
-        return np.clip(texture, 0, 1)
-        
-    def create_generic_texture(self, noise, resolution):
-        """Create generic material texture"""
+        texture = noise
+        affine_channels(texture, DETAIL_GAINS['create_wood_texture'], np.float32([0.6, 0.4, 0.2]))
+        
+        texture += grain[..., np.newaxis]
+        
+        return np.clip(texture, 0, 1, out=texture)
+        
+    def create_generic_texture(self, noise, resolution, noise_field, row_offset=0):
+        """Create generic material texture (overwrites noise)"""
         # Neutral gray base with variation
-        texture = np.zeros((resolution, resolution, 3))
-        base_color = 0.5 + noise * 0.3
-        texture = base_color
+        texture = noise
+        texture *= DETAIL_GAINS['create_generic_texture']
+        texture += np.float32(0.5)
+        
+        # Low-frequency mottling
+        self.apply_pattern(texture, noise_field, row_offset, fbm, np.float32(0.1), period=4)
         
         return texture
         
-    def post_process_texture(self, image, category):
+    def post_process_texture(self, image, category, noise_field):
         """Apply post-processing for enhanced realism"""
-        # Convert PIL to numpy for processing
-        img_array = np.array(image)
+        # Convert PIL to numpy for processing, and back
+        return Image.fromarray(self.post_process_array(np.array(image), category, noise_field))
         
-        # Apply category-specific enhancements
-        if category == 'cannabis':
-            img_array = self.enhance_cannabis_texture(img_array)
-        elif category == 'avatar':
-            img_array = self.enhance_skin_texture(img_array)
-        elif category == 'environment':
-            img_array = self.enhance_environment_texture(img_array)
-            
-        # Convert back to PIL
-        processed_image = Image.fromarray(img_array.astype(np.uint8))
+    def post_process_array(self, img_array, category, noise_field, enhanced_out=None):
+        """Post-process a uint8 RGB array in place and return it
         
-        # Apply PIL-based enhancements
-        processed_image = self.apply_pil_enhancements(processed_image)
+        enhanced_out, if given, receives a copy of the array after the category enhancement.
+        """
+        img_array = self.enhance_category_texture(img_array, category, noise_field)
+        if enhanced_out is not None:
+            np.copyto(enhanced_out, img_array)
         
-        return processed_image
+        # Sharpen, contrast and color in one pooled float32 buffer
+        with self.buffer_pool.borrow(img_array.shape, np.float32) as work:
+            self.sharpen_texture(img_array, out=work)
+            mean = math.fsum(self.luminance_rows(work)) / (work.shape[0] * work.shape[1])
+            return self.contrast_color_texture(work, mean, out=img_array)
         
-    def enhance_cannabis_texture(self, img_array):
-        """Enhance cannabis-specific textures"""
-        # Increase green saturation
-        img_array[:, :, 1] = np.clip(img_array[:, :, 1] * 1.2, 0, 255)
+    def enhance_category_texture(self, img_array, category, noise_field, row_offset=0):
+        """Apply category-specific enhancements (CATEGORY_ENHANCERS) to a uint8 array in place"""
+        enhancer = CATEGORY_ENHANCERS.get(category)
+        if enhancer:
+            img_array = getattr(self, enhancer)(img_array, noise_field, row_offset)
+            
+        return img_array
         
-        # Add subtle noise for organic feel
-        noise = np.random.normal(0, 5, img_array.shape)
-        img_array = np.clip(img_array + noise, 0, 255)
+    def enhance_cannabis_texture(self, img_array, noise_field, row_offset=0):
+        """Enhance cannabis-specific textures"""
+        # Increase green saturation, then add subtle noise for organic
+        # feel, a band of rows at a time
+        for band in row_bands(img_array.shape[0]):
+            green = img_array[band, :, 1].astype(np.float32)
+            green *= np.float32(1.2)
+            img_array[band, :, 1] = np.minimum(green, 255, out=green)
+            
+            work = img_array[band].astype(np.float32)
+            noise = noise_field.normal(row_offset + band.start, row_offset + band.stop, work.shape[1])
+            noise *= np.float32(5)
+            work += noise
+            img_array[band] = np.clip(work, 0, 255, out=work)
         
         return img_array
         
-    def enhance_skin_texture(self, img_array):
+    def enhance_skin_texture(self, img_array, noise_field, row_offset=0):
         """Enhance skin texture realism"""
+        import cv2
+        
         # Smooth the texture slightly
-        img_array = cv2.GaussianBlur(img_array, (3, 3), 0.5)
+        cv2.GaussianBlur(img_array, (3, 3), 0.5, dst=img_array)
         
-        # Add subtle color variation
-        variation = np.random.normal(1, 0.02, img_array.shape)
-        img_array = np.clip(img_array * variation, 0, 255)
+        # Add subtle color variation, a band of rows at a time
+        for band in row_bands(img_array.shape[0]):
+            variation = noise_field.normal(row_offset + band.start, row_offset + band.stop, img_array.shape[1])
+            variation *= np.float32(0.02)
+            variation += np.float32(1)
+            variation *= img_array[band]
+            img_array[band] = np.clip(variation, 0, 255, out=variation)
         
         return img_array
         
-    def enhance_environment_texture(self, img_array):
+    def enhance_environment_texture(self, img_array, noise_field, row_offset=0):
         """Enhance environment textures"""
         # Increase contrast slightly
-        img_array = np.clip((img_array - 128) * 1.1 + 128, 0, 255)
+        for band in row_bands(img_array.shape[0]):
+            work = img_array[band].astype(np.float32)
+            work -= np.float32(128)
+            work *= np.float32(1.1)
+            work += np.float32(128)
+            img_array[band] = np.clip(work, 0, 255, out=work)
         
         return img_array
         
+    def sharpen_texture(self, img_array, out=None):
+        """Sharpen a uint8 image like ImageEnhance.Sharpness into a float32 buffer (out if given)
+        
+        As in PIL, the outermost rows and columns are left unfiltered and
+        values are truncated to whole levels.
+        """
+        work = self.sharpen_unrounded(img_array, out)
+        np.clip(work, 0, 255, out=work)
+        return np.floor(work, out=work)
+        
+    def sharpen_unrounded(self, image, out=None):
+        """The sharpening weights of sharpen_texture applied to a uint8 or float32 image, unclipped and unrounded"""
+        import cv2
+        
+        work = cv2.boxFilter(image, cv2.CV_32F, (3, 3), dst=out, normalize=False, borderType=cv2.BORDER_REPLICATE)
+        cv2.addWeighted(image, SHARPEN_CENTER_WEIGHT, work, SHARPEN_BOX_WEIGHT, 0, dst=work, dtype=cv2.CV_32F)
+        work[0] = image[0]
+        work[-1] = image[-1]
+        work[:, 0] = image[:, 0]
+        work[:, -1] = image[:, -1]
+        return work
+        
+    def sharpen_band(self, img_array, band, above=None):
+        """Sharpened float32 rows of a band, reading one neighbour row either side
+        
+        above replaces the row before the band once it has been overwritten.
+        """
+        start = max(0, band.start - 1)
+        stop = min(img_array.shape[0], band.stop + 1)
+        rows = np.array(img_array[start:stop])
+        if above is not None and start < band.start:
+            rows[0] = above
+            
+        return self.sharpen_texture(rows)[band.start - start:band.stop - start]
+        
+    def luminance_rows(self, work):
+        """Per-row float64 sums of the luminance of a float32 RGB buffer"""
+        import cv2
+        
+        return np.concatenate([cv2.cvtColor(work[band], cv2.COLOR_RGB2GRAY).sum(axis=1, dtype=np.float64)
+                               for band in row_bands(work.shape[0])])
+        
+    def contrast_color_texture(self, work, mean, out=None):
+        """Apply contrast around the luminance mean, then saturation, to a float32 buffer in place
+        
+        Matches ImageEnhance.Contrast and ImageEnhance.Color; returns uint8
+        (written to out if given).
+        """
+        import cv2
+        
+        # Each step truncates to whole levels, as PIL's uint8 blends do
+        offset = np.float32(int(mean + 0.5) * (1 - CONTRAST_FACTOR))
+        for band in row_bands(work.shape[0]):
+            rows = work[band]
+            rows *= np.float32(CONTRAST_FACTOR)
+            rows += offset
+            np.clip(rows, 0, 255, out=rows)
+            np.floor(rows, out=rows)
+            
+            gray = cv2.cvtColor(rows, cv2.COLOR_RGB2GRAY)
+            gray += np.float32(0.5)
+            np.floor(gray, out=gray)
+            gray *= np.float32(1 - COLOR_FACTOR)
+            rows *= np.float32(COLOR_FACTOR)
+            rows += cv2.cvtColor(gray, cv2.COLOR_GRAY2RGB)
+            np.clip(rows, 0, 255, out=rows)
+            
+        if out is None:
+            return work.astype(np.uint8)
+        np.copyto(out, work, casting='unsafe')
+        return out
+        
     def apply_pil_enhancements(self, image):
-        """Apply PIL-based enhancements"""
+        """Apply the PIL ImageEnhance chain (reference for the fused post-processing)"""
         # Enhance sharpness
         enhancer = ImageEnhance.Sharpness(image)
-        image = enhancer.enhance(1.2)
+        image = enhancer.enhance(SHARPNESS_FACTOR)
         
         # Enhance contrast
         enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(1.1)
+        image = enhancer.enhance(CONTRAST_FACTOR)
         
         # Enhance color
         enhancer = ImageEnhance.Color(image)
-        image = enhancer.enhance(1.05)
+        image = enhancer.enhance(COLOR_FACTOR)
         
         return image
         
-    def make_seamless(self, image):
+    def make_seamless(self, image, mode=None):
         """Convert image to seamless tileable texture"""
         img_array = np.array(image)
-        h, w = img_array.shape[:2]
+        self.make_seamless_array(img_array, mode)
+        return Image.fromarray(img_array)
         
-        # Blend edges for seamless tiling
-        blend_size = min(h, w) // 8
+    def make_seamless_array(self, img_array, mode=None):
+        """Make a uint8 image array tile seamlessly, in place (works on np.memmap)
         
-        # Create blending masks
-        for i in range(blend_size):
-            alpha = i / blend_size
+        mode is one of SEAMLESS_MODES (default SEAMLESS_MODE). Rows are made
+        periodic first, then columns.
+        """
+        mode = mode or SEAMLESS_MODE
+        if mode not in SEAMLESS_MODES:
+            raise ValueError(f"Unknown seamless mode {mode}; available: {', '.join(SEAMLESS_MODES)}")
             
-            # Top-bottom blending
-            img_array[i] = (1 - alpha) * img_array[h - blend_size + i] + alpha * img_array[i]
-            img_array[h - 1 - i] = (1 - alpha) * img_array[blend_size - 1 - i] + alpha * img_array[h - 1 - i]
+        if mode == 'mirror':
+            mirror_tile(img_array)
+            return img_array
             
-            # Left-right blending
-            img_array[:, i] = (1 - alpha) * img_array[:, w - blend_size + i] + alpha * img_array[:, i]
-            img_array[:, w - 1 - i] = (1 - alpha) * img_array[:, blend_size - 1 - i] + alpha * img_array[:, w - 1 - i]
+        # Blend edges for seamless tiling
+        blend_size = min(img_array.shape[:2]) // 8
+        blend_seam(img_array, blend_size, mode, axis=0)
+        blend_seam(img_array, blend_size, mode, axis=1)
         
-        return Image.fromarray(img_array.astype(np.uint8))
+        return img_array
         
     def create_fallback_texture(self, resolution):
         """Create a simple fallback texture if generation fails"""
+        metrics.inc('texture_fallbacks_total', resolution=resolution)
+        
         # Create a simple gradient texture
         gradient = np.linspace(0, 255, resolution)
         texture = np.zeros((resolution, resolution, 3), dtype=np.uint8)
@@ -332,59 +1217,919 @@ class HyperRealisticTextureGenerator:
             
         return Image.fromarray(texture)
 
-# Initialize the texture generator
-texture_generator = HyperRealisticTextureGenerator()
+def row_bands(height, band_rows=None):
+    """Yield row slices covering height in bands of band_rows"""
+    band_rows = band_rows or BAND_ROWS
+    for start in range(0, height, band_rows):
+        yield slice(start, min(start + band_rows, height))
 
-@app.route('/api/generate-texture', methods=['POST'])
-def generate_texture():
-    """Generate AI texture endpoint"""
+def has_extreme_levels(image):
+    """Whether any value of a uint8 image is 0 or 255"""
+    import cv2
+    
+    low, high = cv2.minMaxLoc(image.reshape(image.shape[0], -1))[:2]
+    return low == 0 or high == 255
+
+def affine_channels(image, scale, offset=None):
+    """image * scale + offset in place, with per-channel (or scalar) float32 scale and offset
+    
+    A contiguous (..., W, C) image is worked on as rows of W*C values against
+    tiled scale and offset rows: the same float32 arithmetic as broadcasting,
+    without numpy's slow C-wide inner loop.
+    """
+    if not image.flags.c_contiguous:
+        image *= scale
+        if offset is not None:
+            image += offset
+        return image
+        
+    width, channels = image.shape[-2:]
+    rows = image.reshape(image.shape[:-2] + (width * channels,))
+    rows *= np.tile(np.broadcast_to(scale, channels), width)
+    if offset is not None:
+        rows += np.tile(np.broadcast_to(offset, channels), width)
+    return image
+
+def blend_seam(img_array, blend_size, mode, axis):
+    """Make img_array periodic along axis (0 rows, 1 columns) by rewriting blend_size lines at each end
+    
+    Every blend reads original lines only, so the result does not depend on
+    processing order. Weights are 7-bit fixed point so the arithmetic stays
+    in int16, and the other axis goes in chunks of SEAM_CHUNK_PIXELS.
+    """
+    import cv2
+    
+    length = img_array.shape[axis]
+    ramp = (np.arange(blend_size, dtype=np.float32) + np.float32(0.5)) / np.float32(blend_size)
+    
+    # Weight of the replacement lines, highest at the seam
+    if mode == 'blend':
+        ramp = np.float32(0.5) * (1 - ramp)
+    else:
+        ramp = 1 - ramp
+    weight = np.rint(ramp * 128).astype(np.int16)[:, np.newaxis, np.newaxis]
+    if axis == 1:
+        # Spell out the channels so the multiply runs over contiguous (blend_size, channels) rows
+        weight = np.repeat(weight.reshape(1, -1, 1), img_array.shape[2], axis=2)
+    
+    def strip(start, stop, chunk):
+        return (slice(start, stop), chunk) if axis == 0 else (chunk, slice(start, stop))
+        
+    def weighted_delta(target, source):
+        delta = source.astype(np.int16)
+        delta -= target
+        delta *= weight
+        delta += 64
+        delta >>= 7
+        return delta
+        
+    # Line i from the start pairs with line i from the end (length - 1 - i)
+    middle = length // 2
+    for chunk in row_bands(img_array.shape[1 - axis], max(1, SEAM_CHUNK_PIXELS // blend_size)):
+        first = np.ascontiguousarray(img_array[strip(0, blend_size, chunk)])
+        last = cv2.flip(np.ascontiguousarray(img_array[strip(length - blend_size, length, chunk)]), axis)
+        
+        if mode == 'blend':
+            # Crossfade opposite edges towards each other; they meet at the seam
+            new_first = weighted_delta(first, last)
+            new_last = last - new_first
+            new_first += first
+        else:
+            # Crossfade towards the image shifted by half its length, which is continuous across the seam
+            middle_first = img_array[strip(middle, middle + blend_size, chunk)]
+            middle_last = cv2.flip(np.ascontiguousarray(img_array[strip(middle - blend_size, middle, chunk)]), axis)
+            new_first = weighted_delta(first, middle_first)
+            new_first += first
+            new_last = weighted_delta(last, middle_last)
+            new_last += last
+            
+        img_array[strip(0, blend_size, chunk)] = new_first
+        img_array[strip(length - blend_size, length, chunk)] = cv2.flip(new_last.astype(np.uint8), axis)
+
+def mirror_tile(img_array):
+    """Fill img_array in place with its top-left quadrant and the quadrant's reflections"""
+    import cv2
+    
+    height, width = img_array.shape[:2]
+    half_height, half_width = height // 2, width // 2
+    
+    for rows in row_bands(half_height):
+        img_array[rows, width - half_width:] = cv2.flip(np.ascontiguousarray(img_array[rows, :half_width]), 1)
+    for rows in row_bands(half_height):
+        img_array[height - rows.stop:height - rows.start] = img_array[rows][::-1]
+
+def seam_error(img_array):
+    """Wraparound seam error of a tiling texture
+    
+    Mean absolute step across the bottom/top and right/left seams divided by
+    the mean step between neighbouring pixels inside the image; about 1.0
+    when the seam is invisible.
+    """
+    pixels = np.asarray(img_array, dtype=np.int16)
+    seam = (np.abs(pixels[0] - pixels[-1]).mean() + np.abs(pixels[:, 0] - pixels[:, -1]).mean()) / 2
+    interior = (np.abs(np.diff(pixels, axis=0)).mean() + np.abs(np.diff(pixels, axis=1)).mean()) / 2
+    return float(seam / interior) if interior else float(seam > 0)
+
+def output_format(options):
+    """Encoding format named by the request options"""
+    return (options or {}).get('format') or DEFAULT_FORMAT
+
+def variant_count(options):
+    """Number of textures a request's variants option asks for (1 without it)"""
+    return (options or {}).get('variants') or 1
+    
+def mip_sizes(resolution):
+    """Sizes of the mip levels below resolution, from at most MIP_MAX_SIZE down to MIP_MIN_SIZE"""
+    sizes = []
+    size = min(resolution // 2, MIP_MAX_SIZE)
+    while size >= MIP_MIN_SIZE:
+        sizes.append(size)
+        size //= 2
+    return sizes
+
+def texture_seed(prompt, style, resolution, category):
+    """Derive a stable 64-bit seed from the normalized request (unlike hash(), not salted per process)"""
+    return int(key_digest(normalize_key(prompt, style, resolution, category))[:16], 16)
+
+def texture_key(prompt, style, resolution, category):
+    """The normalized request plus the noise source: cache and flight keys start with it"""
+    return normalize_key(prompt, style, resolution, category) + (NOISE_SOURCE,)
+
+def metric_labels(resolution, category):
+    """Resolution and category labels for texture metrics"""
+    return {
+        'resolution': resolution,
+        'category': category if category in METRIC_CATEGORIES else 'other'
+    }
+
+def new_noise_field(seed):
+    """Noise for one texture: windows of the shared noise bank if built, else fresh draws"""
+    if noise_bank is not None:
+        return noise_bank.field(seed)
+    return NoiseField(seed)
+
+def encode_image(image, fmt, **params):
+    """Encode a PIL image to bytes"""
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    return buffer.getvalue()
+
+# Pipeline metrics; job workers send theirs back with each result
+metrics = MetricsRegistry()
+metrics.describe(STAGE_SECONDS, 'histogram', "Time spent in each texture pipeline stage")
+metrics.describe(REQUEST_SECONDS, 'histogram', "Texture API request handling time")
+metrics.describe('texture_cache_lookups_total', 'counter', "Texture cache lookups by result")
+metrics.describe('texture_preset_lookups_total', 'counter', "Baked preset lookups by result")
+metrics.describe('texture_fallbacks_total', 'counter', "Fallback textures served after a generation error")
+metrics.describe('texture_flights_total', 'counter', "Uncached texture requests by single-flight role")
+metrics.describe('texture_variants_total', 'counter', "Resized asset variant requests by cache result")
+
+# Map the noise bank once per process; the OS shares its pages between workers.
+# NOISE_SOURCE tags the cache, flight and preset keys of textures rendered from it
+noise_bank = load_noise_bank(NOISE_BANK_DIR)
+if noise_bank is not None:
+    logger.info(f"Using noise bank {NOISE_BANK_DIR} ({noise_bank.rows}x{noise_bank.width})")
+NOISE_SOURCE = noise_source(noise_bank)
+
+# The texture generator is built on first use (or by the warmup), not at import
+texture_generator = None
+texture_generator_lock = threading.Lock()
+
+# The job pool starts its worker processes on the first job; results are saved on its finalize threads
+texture_jobs = TextureJobManager(max_workers=TEXTURE_JOB_WORKERS, queue_depth=TEXTURE_JOB_QUEUE_DEPTH,
+                                 finalize_workers=TEXTURE_FINALIZE_WORKERS)
+
+# Pre-baked preset textures, re-read whenever bake_presets.py replaces the manifest
+preset_manifest = PresetManifest(PRESET_MANIFEST_PATH, NOISE_SOURCE)
+
+# Job ids of the texture jobs in flight by flight_key(); duplicates join them. Reentrant
+# because a job finished while the finalize pool shuts down runs its done callback in place
+inflight_jobs = {}
+inflight_lock = threading.RLock()
+
+# Flights across the workers on this host, and the threads that wait on them
+host_flights = HostFlights(TEXTURE_FLIGHT_DIR, stripes=FLIGHT_LOCK_STRIPES)
+flight_waiters = ThreadPoolExecutor(max_workers=TEXTURE_JOB_QUEUE_DEPTH, thread_name_prefix='texture-flight')
+
+# Admits uncached texture work in this process against the memory and CPU budgets
+admission = AdmissionController(
+    memory_budget=TEXTURE_ADMISSION_MEMORY_BYTES,
+    cpu_budget=TEXTURE_ADMISSION_CPU_SECONDS * TEXTURE_JOB_WORKERS,
+    workers=TEXTURE_JOB_WORKERS,
+    max_wait=TEXTURE_ADMISSION_WAIT,
+    max_waiting=TEXTURE_ADMISSION_MAX_WAITING
+)
+metrics.collect('texture_admission_total', 'counter', "Texture jobs by admission result",
+                lambda: [({'result': name}, count) for name, count in admission.stats().items()
+                         if name in admission.counters])
+metrics.collect('texture_admission_waiting', 'gauge', "Requests waiting for admission",
+                lambda: admission.stats()['waiting'])
+metrics.collect('texture_admission_memory_bytes', 'gauge', "Estimated worker memory of admitted texture jobs",
+                lambda: admission.stats()['memory_bytes'])
+metrics.collect('texture_admission_cpu_seconds', 'gauge', "Estimated CPU time of admitted texture jobs",
+                lambda: admission.stats()['cpu_seconds'])
+metrics.collect('texture_jobs_pending', 'gauge', "Texture jobs queued or running",
+                lambda: texture_jobs.stats()['pending'])
+
+# Generated files, shared by the service workers on this host
+blob_store = BlobStore(TEXTURE_BLOB_DIR, TEXTURE_BLOB_QUOTA_BYTES, TEXTURE_BLOB_INDEX_DIR, grace=BLOB_GC_GRACE)
+blob_collector_started = threading.Event()
+
+# Conditional responses for generated assets, with their ETags cached per file
+static_responder = StaticResponder()
+
+# Resized asset variants, shared by the service workers on this host
+variant_cache = VariantCache(TEXTURE_VARIANT_DIR, TEXTURE_VARIANT_CACHE_BYTES)
+
+# Writes texture files for inline responses off the response path
+persist_executor = ThreadPoolExecutor(max_workers=1)
+
+# Latest buffer pool stats from each job worker process, by pid
+worker_buffer_pools = {}
+
+# Progress of the startup warmup, reported by /api/health
+warmup_status = {'state': 'idle', 'seconds': None}
+warmup_finished = threading.Event()
+
+def get_texture_generator():
+    """The process-wide texture generator, created on first use"""
+    global texture_generator
+    if texture_generator is None:
+        with texture_generator_lock:
+            if texture_generator is None:
+                texture_generator = HyperRealisticTextureGenerator()
+    return texture_generator
+
+def reset_after_fork():
+    """Give forked job workers fresh locks and state, acquiring none of the parent's locks
+    
+    A request thread may hold any of them at the moment of the fork, and it
+    does not exist in the child to release them: the generator lock (in case
+    the fork landed mid-construction), the metrics registry (workers only
+    send back their own samples) and the generator's buffer pool.
+    """
+    global texture_generator_lock
+    texture_generator_lock = threading.Lock()
+    metrics.reset_after_fork()
+    if texture_generator is not None:
+        texture_generator.buffer_pool.reset_after_fork()
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+def warm_up():
+    """Build the generator and run one small texture through the pipeline
+    
+    This imports OpenCV, fills the noise and pattern tables and the buffer
+    pool, so the first real request (and job workers forked afterwards)
+    start warm.
+    """
+    warmup_status['state'] = 'running'
+    start = time.perf_counter()
     try:
-        data = request.json
-        prompt = data.get('prompt', 'generic texture')
-        style = data.get('style', 'photorealistic')
-        resolution = int(data.get('resolution', 1024))
-        category = data.get('category', 'general')
+        test_texture = get_texture_generator().generate_texture(
+            "test cannabis bud texture", 
+            "photorealistic", 
+            512, 
+            "cannabis"
+        )
+        test_texture.save("assets/textures/ai_generated/startup_test.jpg")
+        warmup_status['state'] = 'done'
+        logger.info("Startup test texture generated successfully")
+    except Exception as e:
+        warmup_status['state'] = 'failed'
+        logger.warning(f"Startup test failed: {str(e)}")
+    finally:
+        warmup_status['seconds'] = round(time.perf_counter() - start, 3)
+        warmup_finished.set()
+
+def collect_blobs():
+    """Background thread: collect the blob store every BLOB_GC_INTERVAL seconds"""
+    while True:
+        try:
+            freed = blob_store.collect()
+            if freed:
+                logger.info(f"Blob store collected {freed / 2**20:.1f} MB")
+        except Exception as e:
+            logger.warning(f"Blob collection failed: {str(e)}")
+        time.sleep(BLOB_GC_INTERVAL)
         
-        # Validate inputs
-        if resolution not in [512, 1024, 2048]:
-            resolution = 1024
+def create_app(warmup=None):
+    """Build the texture service Flask app
+    
+    warmup is one of WARMUP_MODES (default TEXTURE_WARMUP). The app answers
+    requests while a background warmup runs; anything it has not built yet
+    is built by the first request that needs it.
+    """
+    warmup = warmup or TEXTURE_WARMUP
+    if warmup not in WARMUP_MODES:
+        raise ValueError(f"Unknown warmup mode {warmup}; available: {', '.join(WARMUP_MODES)}")
+        
+    app = Flask(__name__)
+    CORS(app, origins="*")
+    app.register_blueprint(texture_bp)
+    
+    if not blob_collector_started.is_set():
+        blob_collector_started.set()
+        threading.Thread(target=collect_blobs, name='texture-blob-gc', daemon=True).start()
+        
+    if warmup_status['state'] == 'idle':
+        if warmup == 'sync':
+            warm_up()
+        elif warmup == 'background':
+            warmup_status['state'] = 'starting'
+            threading.Thread(target=warm_up, name='texture-warmup', daemon=True).start()
             
-        if style not in ['photorealistic', 'artistic', 'cartoon', 'abstract']:
-            style = 'photorealistic'
+    return app
+
+@texture_bp.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@texture_bp.after_request
+def record_request_time(response):
+    """Time every texture API request; handlers add resolution/category labels via g.metric_labels"""
+    if request.endpoint and 'request_started' in g:
+        metrics.observe(REQUEST_SECONDS, time.perf_counter() - g.request_started,
+                        endpoint=request.endpoint.rsplit('.', 1)[-1], status=response.status_code,
+                        **g.get('metric_labels', {}))
+    return response
+
+def request_data():
+    """Texture parameters from the JSON body (POST) or the query string (GET)"""
+    if request.method == 'GET':
+        return request.args.to_dict()
+    return request.get_json(silent=True) or {}
+
+def parse_texture_options(data, accept_mimetypes=None):
+    """Read output options (levels, maps, variants, format) from a request body and Accept header
+    
+    Raises ValueError for an unsupported explicit format or a non-integer variant count.
+    """
+    data = data or {}
+    return {
+        'levels': str(data.get('levels', False)).lower() in ('1', 'true', 'yes'),
+        'maps': str(data.get('maps', False)).lower() in ('1', 'true', 'yes'),
+        'variants': int(data.get('variants') or 1),
+        'format': negotiate_format(accept_mimetypes, data.get('format')),
+        'inline': str(data.get('inline', False)).lower() in ('1', 'true', 'yes')
+    }
+
+def parse_texture_request(data):
+    """Read and validate (prompt, style, resolution, category) from a request body"""
+    data = data or {}
+    prompt = data.get('prompt', 'generic texture')
+    style = data.get('style', 'photorealistic')
+    resolution = int(data.get('resolution', 1024))
+    category = data.get('category', 'general')
+    
+    # Validate inputs
+    if resolution not in TEXTURE_RESOLUTIONS:
+        resolution = 1024
+        
+    if style not in TEXTURE_STYLES:
+        style = 'photorealistic'
+        
+    return prompt, style, resolution, category
+
+def check_texture_options(resolution, options):
+    """Reject output option combinations that cannot be served (raises ValueError)"""
+    options = options or {}
+    if options.get('maps') and options.get('inline'):
+        raise ValueError("PBR maps cannot be returned inline")
+    if not 1 <= variant_count(options) <= VARIANTS_MAX:
+        raise ValueError(f"variants must be between 1 and {VARIANTS_MAX}")
+    if variant_count(options) > 1 and options.get('inline'):
+        raise ValueError("Texture variants cannot be returned inline")
+    if resolution < TILED_MIN_RESOLUTION:
+        return
+    if options.get('maps'):
+        raise ValueError(f"PBR maps are available below {TILED_MIN_RESOLUTION}px only")
+    if variant_count(options) > 1:
+        raise ValueError(f"Texture variants are available below {TILED_MIN_RESOLUTION}px only")
+    if output_format(options) not in TILED_FORMATS:
+        raise ValueError(f"{resolution}px textures are available as {', '.join(TILED_FORMATS)} only")
+    if options.get('inline'):
+        raise ValueError(f"{resolution}px textures cannot be returned inline")
+
+def run_texture_job(prompt, style, resolution, category, options):
+    """Process pool entry point: generate and encode one texture"""
+    return get_texture_generator().encode_texture(prompt, style, resolution, category, options), worker_stats()
+
+def run_texture_batch_job(specs, options):
+    """Process pool entry point: generate and encode a batch of textures"""
+    return get_texture_generator().encode_textures(specs, options), worker_stats()
+
+def run_texture_atlas_job(specs, layout, padding, options, cached):
+    """Process pool entry point: generate, pack and encode an atlas"""
+    return get_texture_generator().encode_atlas(specs, layout, padding, options, cached), worker_stats()
+
+def worker_stats():
+    """This job worker's pid, buffer pool snapshot and new metric samples, sent back with every job result"""
+    return os.getpid(), get_texture_generator().buffer_pool.stats(), metrics.drain()
+
+def record_worker_stats(job_output):
+    """Keep the stats a worker sent with its result, merge its metrics and return the result"""
+    output, (pid, stats, samples) = job_output
+    worker_buffer_pools[pid] = stats
+    metrics.merge(samples)
+    return output
+
+def buffer_pool_stats():
+    """Buffer pool totals over the job workers, as of each worker's latest job"""
+    workers = dict(worker_buffer_pools)
+    totals = {name: sum(stats[name] for stats in workers.values())
+              for name in ('hits', 'misses', 'discards', 'resident_bytes')}
+    lookups = totals['hits'] + totals['misses']
+    totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+    totals['workers'] = {str(pid): stats for pid, stats in workers.items()}
+    return totals
+
+def store_texture_files(outputs, resolution, extension, prefix=''):
+    """Store one texture's encoded outputs (named prefix + output name) as blobs and return their URLs
+    
+    The result holds imageUrl, thumbnailUrl and filename, plus mipLevels
+    and maps when those outputs were encoded.
+    """
+    # Save texture
+    if 'texture_file' in outputs:
+        # Tiled textures were streamed to a scratch file on the same filesystem
+        filepath = blob_store.put_file(outputs['texture_file'], extension)
+    else:
+        filepath = blob_store.put(outputs[prefix + 'texture'], extension)
+        
+    # Save thumbnail
+    thumb_filepath = blob_store.put(outputs[prefix + 'thumbnail'], extension)
+    
+    logger.info(f"Texture saved: {filepath}")
+    
+    files = {
+        'imageUrl': f"/{filepath}",
+        'thumbnailUrl': f"/{thumb_filepath}",
+        'filename': os.path.basename(filepath)
+    }
+    
+    # Save mip levels, largest first; the 256 level is the thumbnail
+    if any(name.startswith(prefix + 'mip_') for name in outputs):
+        mip_levels = [{'size': resolution, 'url': files['imageUrl']}]
+        for size in mip_sizes(resolution):
+            if size == THUMBNAIL_SIZE:
+                mip_levels.append({'size': size, 'url': files['thumbnailUrl']})
+                continue
+            mip_filepath = blob_store.put(outputs[f"{prefix}mip_{size}"], extension)
+            mip_levels.append({'size': size, 'url': f"/{mip_filepath}"})
+        files['mipLevels'] = mip_levels
+        
+    # Save PBR maps; 'orm' packs occlusion, roughness and metalness into R, G and B
+    if prefix + 'orm' in outputs:
+        files['maps'] = {name: f"/{blob_store.put(outputs[prefix + name], extension)}" for name in PBR_MAP_NAMES}
+        
+    return files
+    
+def save_texture(prompt, style, resolution, category, outputs, options=None):
+    """Store the texture, thumbnail, mip level and map files as blobs and return the response payload
+    
+    With the variants option the payload's own files are variant 0's, and
+    'variants' lists the files of every variant, variant 0 first.
+    """
+    started = time.perf_counter()
+    fmt = output_format(options)
+    profile = get_profile(fmt)
+    files = store_texture_files(outputs, resolution, profile['extension'])
+    
+    payload = {
+        'success': True,
+        'resolution': f"{resolution}x{resolution}",
+        'style': style,
+        'category': category,
+        'prompt': prompt,
+        'format': fmt,
+        'mimeType': profile['mimetype']
+    }
+    payload.update(files)
+    
+    if variant_count(options) > 1:
+        payload['variants'] = [files] + [store_texture_files(outputs, resolution, profile['extension'], f"variant{variant}_")
+                                         for variant in range(1, variant_count(options))]
+
+    metrics.observe(STAGE_SECONDS, time.perf_counter() - started, stage='save', **metric_labels(resolution, category))
+    return payload
+
+def baked_texture(prompt, style, resolution, category, options=None):
+    """The pre-baked preset payload for a request, or None (inline requests need the bytes; presets have no maps or variants)"""
+    options = options or {}
+    if options.get('inline') or options.get('maps') or variant_count(options) > 1:
+        return None
+    payload = preset_manifest.lookup(prompt, style, resolution, category, output_format(options), options.get('levels'))
+    metrics.inc('texture_preset_lookups_total', result='hit' if payload is not None else 'miss')
+    return payload
+
+def texture_cost(resolution, category, maps=False, variants=1):
+    """Estimated (peak worker memory in bytes, CPU seconds) of generating one texture (or a variation set)"""
+    pixels = resolution * resolution
+    cpu = pixels / 1e6 * ADMISSION_CPU_PER_MEGAPIXEL.get(category, ADMISSION_CPU_PER_MEGAPIXEL['general'])
+    if resolution >= TILED_MIN_RESOLUTION:
+        return ADMISSION_TILED_BYTES, cpu * ADMISSION_TILED_CPU_FACTOR
+        
+    memory = pixels * (ADMISSION_MAPS_BYTES_PER_PIXEL if maps else ADMISSION_BYTES_PER_PIXEL)
+    cpu *= 1 + (variants - 1) * ADMISSION_VARIANT_CPU_SHARE
+    if maps:
+        cpu += variants * pixels / 1e6 * ADMISSION_MAPS_CPU_PER_MEGAPIXEL
+    if variants > 1:
+        memory += pixels * ADMISSION_VARIANTS_BYTES_PER_PIXEL
+    return memory, cpu
+
+def batch_cost(specs, maps=False):
+    """Estimated (peak memory, CPU seconds) of a batch job
+    
+    The job generates one group at a time, so memory is that of the
+    largest batch buffer (capped by BATCH_MAX_PIXELS) or of the maps of
+    its largest texture, while CPU adds up.
+    """
+    memory = 0
+    pixels = {}
+    for prompt, style, resolution, category in specs:
+        if resolution >= TILED_MIN_RESOLUTION:
+            memory = max(memory, ADMISSION_TILED_BYTES)
+        else:
+            pixels[resolution] = pixels.get(resolution, 0) + resolution * resolution
+            if maps:
+                memory = max(memory, texture_cost(resolution, category, maps)[0])
+    for resolution, total in pixels.items():
+        memory = max(memory, min(total, max(BATCH_MAX_PIXELS, resolution * resolution)) * ADMISSION_BYTES_PER_PIXEL)
+    return memory, sum(texture_cost(spec[2], spec[3], maps)[1] for spec in specs)
+
+def atlas_key(specs, padding, options=None):
+    """Texture cache key of an atlas of specs, in packing order"""
+    digest = key_digest(tuple(normalize_key(*spec) for spec in specs))
+    return ('atlas', digest, padding, output_format(options), NOISE_SOURCE)
+
+def atlas_cost(specs, width, height):
+    """Estimated (peak memory, CPU seconds) of an atlas job: its batch, the finished tiles and the atlas"""
+    memory, cpu = batch_cost(specs)
+    tiles = sum(spec[2] * spec[2] * 3 for spec in specs)
+    return memory + tiles + width * height * 6, cpu + width * height / 1e6 * ATLAS_CPU_PER_MEGAPIXEL
+
+def flight_key(prompt, style, resolution, category, options=None):
+    """Requests with equal flight keys are answered with the same job result"""
+    options = options or {}
+    return texture_key(prompt, style, resolution, category) + (
+        output_format(options), bool(options.get('levels')), bool(options.get('maps')), bool(options.get('inline')),
+        variant_count(options))
+
+def pending_flight(key):
+    """Id of the pending job for a flight key, forgetting it once finished (inflight_lock held)"""
+    job_id = inflight_jobs.get(key)
+    if job_id is not None and not texture_jobs.is_pending(job_id):
+        del inflight_jobs[key]
+        job_id = None
+    return job_id
+
+def land_flight(key, ticket=None):
+    """Done callback of a flight's job: forget it and return its admission budget"""
+    with inflight_lock:
+        pending_flight(key)
+    if ticket is not None:
+        admission.release(ticket)
+
+def submit_flight_leader(digest, hold, spec, params, finish, done=None):
+    """Queue the generation job of a flight whose host lock is held; the job releases it when it ends
+    
+    Waiting workers find the outputs in the shared disk cache or, for
+    non-inline requests, the response payload published under digest.
+    """
+    prompt, style, resolution, category, options = spec
+    
+    def finalize(output):
+        outputs, cacheable = record_worker_stats(output)
+        if cacheable:
+            get_texture_generator().cache_texture(prompt, style, resolution, category, outputs, options)
+        result = finish(outputs)
+        if not (options or {}).get('inline'):
+            host_flights.publish(digest, result)
+        return result
+        
+    def landed():
+        host_flights.release(hold)
+        if done is not None:
+            done()
             
-        logger.info(f"Generating texture: {prompt} ({style}, {resolution}px, {category})")
+    try:
+        return texture_jobs.submit(run_texture_job, spec, finalize, params, done=landed)
+    except Exception:
+        host_flights.release(hold)
+        raise
+
+def follow_host_flight(digest, since, spec, params, finish):
+    """Thread job for a request whose flight another worker on this host leads
+    
+    Waits for that flight, then answers with its published payload or the
+    cached outputs. If it left neither (it failed, or a texture sharing its
+    lock stripe held the lock) this request leads a flight of its own.
+    """
+    options = spec[4] or {}
+    deadline = time.monotonic() + TEXTURE_JOB_TIMEOUT
+    while True:
+        host_flights.wait(digest, max(0, deadline - time.monotonic()))
+        
+        payload = None if options.get('inline') else host_flights.result(digest, since)
+        if payload is not None:
+            return payload
+            
+        cached = get_texture_generator().get_cached_texture(*spec)
+        if cached is not None:
+            return finish(cached)
+            
+        hold = host_flights.try_acquire(digest)
+        if hold is not None:
+            job = texture_jobs.get(submit_flight_leader(digest, hold, spec, params, finish),
+                                   wait=max(0, deadline - time.monotonic()))
+            if job['status'] != 'done':
+                raise RuntimeError(job['error'] or 'Texture generation timed out')
+            return job['result']
+            
+        if time.monotonic() >= deadline:
+            raise TimeoutError('Timed out waiting for another worker generating the same texture')
+
+def submit_texture_job(prompt, style, resolution, category, options=None):
+    """Queue a texture job, or complete it immediately on a baked preset or cache hit, and return its id
+    
+    Concurrent identical requests share one flight: within this process
+    they join the pending job in inflight_jobs, and across the workers on
+    this host the first to take the host_flights lock generates while the
+    others wait for it in a thread and reuse its result.
+    """
+    check_texture_options(resolution, options)
+    params = {'prompt': prompt, 'style': style, 'resolution': resolution, 'category': category}
+    params.update(options or {})
+    
+    def finish(outputs):
+        # Inline jobs hand the encoded bytes to the response and persist in the background
+        if (options or {}).get('inline'):
+            persist_executor.submit(save_texture, prompt, style, resolution, category, outputs, options)
+            return outputs
+        return save_texture(prompt, style, resolution, category, outputs, options)
         
-        # Generate texture
-        texture = texture_generator.generate_texture(prompt, style, resolution, category)
+    baked = baked_texture(prompt, style, resolution, category, options)
+    if baked is not None:
+        return texture_jobs.add_completed(baked, params)
         
-        # Save texture
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"texture_{hash(prompt) % 10000}_{timestamp}_{resolution}.jpg"
-        filepath = f"assets/textures/ai_generated/{filename}"
+    cached = get_texture_generator().get_cached_texture(prompt, style, resolution, category, options)
+    if cached is not None:
+        return texture_jobs.add_completed(finish(cached), params)
         
-        # Save with high quality
-        texture.save(filepath, 'JPEG', quality=95, optimize=True)
+    key = flight_key(prompt, style, resolution, category, options)
+    spec = (prompt, style, resolution, category, options)
+    with inflight_lock:
+        job_id = pending_flight(key)
+    if job_id is not None:
+        metrics.inc('texture_flights_total', role='joined')
+        return job_id
         
-        # Generate thumbnail
-        thumbnail = texture.copy()
-        thumbnail.thumbnail((256, 256), Image.Resampling.LANCZOS)
-        thumb_filename = f"thumb_{filename}"
-        thumb_filepath = f"assets/textures/ai_generated/{thumb_filename}"
-        thumbnail.save(thumb_filepath, 'JPEG', quality=85)
+    # Followers keep their ticket too: the work runs on this host either way
+    ticket = admission.admit(*texture_cost(resolution, category, (options or {}).get('maps'), variant_count(options)))
+    try:
+        with inflight_lock:
+            job_id = pending_flight(key)
+            if job_id is not None:
+                # A duplicate started while this request waited for admission
+                admission.release(ticket)
+                metrics.inc('texture_flights_total', role='joined')
+                return job_id
+                
+            digest = key_digest(key)
+            hold = host_flights.try_acquire(digest)
+            if hold is not None:
+                metrics.inc('texture_flights_total', role='leader')
+                job_id = submit_flight_leader(digest, hold, spec, params, finish, done=lambda: land_flight(key, ticket))
+            else:
+                metrics.inc('texture_flights_total', role='follower')
+                job_id = texture_jobs.submit(follow_host_flight, (digest, time.time(), spec, params, finish), params=params,
+                                             executor=flight_waiters, done=lambda: land_flight(key, ticket))
+            inflight_jobs[key] = job_id
+            return job_id
+    except Exception:
+        admission.release(ticket)
+        raise
+
+def submit_texture_batch_job(specs, options=None):
+    """Queue one job for the specs of a batch that are neither baked nor cached and return its id
+    
+    The job result is a manifest with one save_texture payload per spec, in
+    request order. Duplicate specs are generated once.
+    """
+    if variant_count(options) > 1:
+        raise ValueError("Texture variants are available for single textures only")
+    for spec in specs:
+        check_texture_options(spec[2], options)
+
+    results = [None] * len(specs)
+    pending = {}
+    for index, spec in enumerate(specs):
+        baked = baked_texture(*spec, options)
+        cached = get_texture_generator().get_cached_texture(*spec, options) if baked is None else None
+        if baked is not None:
+            results[index] = baked
+        elif cached is not None:
+            results[index] = save_texture(*spec, cached, options)
+        else:
+            pending.setdefault(normalize_key(*spec), []).append(index)
+            
+    params = {'batch': len(specs), 'generated': len(pending)}
+    params.update(options or {})
+    if not pending:
+        return texture_jobs.add_completed(results, params)
         
-        logger.info(f"Texture saved: {filepath}")
+    groups = list(pending.values())
+    
+    def finalize(batch_output):
+        for indices, (outputs, cacheable) in zip(groups, record_worker_stats(batch_output)):
+            spec = specs[indices[0]]
+            if cacheable:
+                get_texture_generator().cache_texture(*spec, outputs, options)
+            payload = save_texture(*spec, outputs, options)
+            for index in indices:
+                results[index] = payload
+        return results
         
-        return jsonify({
-            'success': True,
-            'imageUrl': f"/{filepath}",
-            'thumbnailUrl': f"/{thumb_filepath}",
-            'filename': filename,
-            'resolution': f"{resolution}x{resolution}",
+    job_specs = [specs[indices[0]] for indices in groups]
+    ticket = admission.admit(*batch_cost(job_specs, (options or {}).get('maps')))
+    try:
+        return texture_jobs.submit(run_texture_batch_job, (job_specs, options), finalize, params,
+                                   done=lambda: admission.release(ticket))
+    except Exception:
+        admission.release(ticket)
+        raise
+
+def save_atlas(specs, layout, padding, outputs, options=None):
+    """Store the atlas and its thumbnail as blobs and return the response payload, with one rectangle per spec"""
+    started = time.perf_counter()
+    width, height, positions = layout
+    fmt = output_format(options)
+    profile = get_profile(fmt)
+    
+    filepath = blob_store.put(outputs['texture'], profile['extension'])
+    thumb_filepath = blob_store.put(outputs['thumbnail'], profile['extension'])
+    
+    logger.info(f"Atlas saved: {filepath}")
+    
+    rects = []
+    for (prompt, style, resolution, category), (x, y) in zip(specs, positions):
+        rects.append({
+            'prompt': prompt,
             'style': style,
+            'resolution': resolution,
             'category': category,
-            'prompt': prompt
+            'x': x,
+            'y': y,
+            'size': resolution,
+            'uv': uv_rect(x, y, resolution, width, height)
         })
         
+    metrics.observe(STAGE_SECONDS, time.perf_counter() - started, stage='save', **metric_labels(width, 'atlas'))
+    return {
+        'success': True,
+        'imageUrl': f"/{filepath}",
+        'thumbnailUrl': f"/{thumb_filepath}",
+        'filename': os.path.basename(filepath),
+        'width': width,
+        'height': height,
+        'padding': padding,
+        'format': fmt,
+        'mimeType': profile['mimetype'],
+        'textures': rects
+    }
+
+def submit_texture_atlas_job(specs, padding=ATLAS_PADDING, options=None):
+    """Queue a job packing specs into one atlas, or complete it from the cache, and return its id
+    
+    The result is a save_atlas payload whose 'textures' holds each spec's
+    pixel rectangle and UV rectangle in request order; duplicate specs share
+    one. Tiles cached as PNG are reused, the others are generated in one
+    batch. Raises ValueError if the specs do not fit in an atlas.
+    """
+    tiles = []
+    tile_of = {}
+    for spec in specs:
+        if spec[2] >= TILED_MIN_RESOLUTION:
+            raise ValueError(f"Atlas textures must be smaller than {TILED_MIN_RESOLUTION}px")
+        tile_of.setdefault(normalize_key(*spec), len(tile_of))
+        if len(tiles) < len(tile_of):
+            tiles.append(spec)
+    layout = pack_atlas([spec[2] for spec in tiles], padding, ATLAS_MAX_SIZE)
+    
+    params = {'atlas': len(specs), 'size': f"{layout[0]}x{layout[1]}", 'padding': padding}
+    params.update(options or {})
+    
+    def finish(outputs):
+        payload = save_atlas(tiles, layout, padding, outputs, options)
+        payload['textures'] = [payload['textures'][tile_of[normalize_key(*spec)]] for spec in specs]
+        return payload
+        
+    generator = get_texture_generator()
+    cached = generator.get_cached_atlas(tiles, padding, options)
+    if cached is not None:
+        return texture_jobs.add_completed(finish(cached), params)
+        
+    def finalize(output):
+        outputs, cacheable = record_worker_stats(output)
+        if cacheable:
+            get_texture_generator().cache_atlas(tiles, padding, outputs, options)
+        return finish(outputs)
+        
+    pixels = {}
+    for i, spec in enumerate(tiles):
+        data = generator.get_cached_pixels(*spec)
+        if data is not None:
+            pixels[i] = data
+            
+    generated = [spec for i, spec in enumerate(tiles) if i not in pixels]
+    ticket = admission.admit(*atlas_cost(generated, layout[0], layout[1]))
+    try:
+        return texture_jobs.submit(run_texture_atlas_job, (tiles, layout, padding, options, pixels), finalize, params,
+                                   done=lambda: admission.release(ticket))
+    except Exception:
+        admission.release(ticket)
+        raise
+
+def busy_response(error):
+    """429 for a request turned away by admission control"""
+    response = jsonify({'success': False, 'error': str(error), 'retryAfter': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+def wait_for_job_response(job_id, respond):
+    """Block on a job for the synchronous endpoints and build the response with respond(result)"""
+    job = texture_jobs.get(job_id, wait=TEXTURE_JOB_TIMEOUT)
+    
+    if job['status'] == 'done':
+        return respond(job['result'])
+        
+    if job['status'] == 'failed':
+        return jsonify({'success': False, 'error': job['error']}), 500
+        
+    # Still running: the client can keep polling the job
+    payload = job_payload(job)
+    payload.update({'success': False, 'error': 'Texture generation timed out'})
+    return jsonify(payload), 504
+
+def inline_texture_response(outputs, options):
+    """Return the encoded texture bytes directly, with validators and cache headers"""
+    data = outputs['texture']
+    
+    response = Response(data, mimetype=get_profile(output_format(options))['mimetype'])
+    response.set_etag(hashlib.blake2b(data, digest_size=16).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = INLINE_TEXTURE_MAX_AGE
+    response.vary.add('Accept')
+    
+    return response.make_conditional(request)
+
+def job_payload(job):
+    """JSON view of a texture job snapshot"""
+    return {
+        'success': job['status'] != 'failed',
+        'jobId': job['id'],
+        'status': job['status'],
+        'statusUrl': f"/api/texture-jobs/{job['id']}",
+        'params': job['params'],
+        'result': job['result'],
+        'error': job['error']
+    }
+
+@texture_bp.route('/api/generate-texture', methods=['GET', 'POST'])
+def generate_texture():
+    """Generate AI texture endpoint (waits on a texture job)
+    
+    With inline=true the image bytes are the response body; GET takes the
+    same parameters from the query string so inline responses are cacheable.
+    With maps=true the payload adds 'maps', the URLs of the height, normal
+    and ORM (occlusion, roughness, metalness) maps derived from the texture.
+    With variants=K (up to VARIANTS_MAX) it adds 'variants', the files of K
+    alternatives sharing the texture's structure; the first is the texture.
+    Requests admission control turns away get 429 with Retry-After.
+    """
+    try:
+        data = request_data()
+        prompt, style, resolution, category = parse_texture_request(data)
+        options = parse_texture_options(data, request.accept_mimetypes)
+        g.metric_labels = metric_labels(resolution, category)
+        
+        logger.info(f"Generating texture: {prompt} ({style}, {resolution}px, {category})")
+        
+        job_id = submit_texture_job(prompt, style, resolution, category, options)
+        if options['inline']:
+            return wait_for_job_response(job_id, lambda outputs: inline_texture_response(outputs, options))
+        return wait_for_job_response(job_id, jsonify)
+        
+    except AdmissionRejected as e:
+        return busy_response(e)
+        
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
     except Exception as e:
         logger.error(f"Error in generate_texture: {str(e)}")
         return jsonify({
@@ -392,7 +2137,158 @@ def generate_texture():
             'error': str(e)
         }), 500
 
-@app.route('/api/analyze-plant', methods=['POST'])
+@texture_bp.route('/api/generate-textures', methods=['POST'])
+def generate_textures():
+    """Generate a batch of textures in one request and return a manifest
+    
+    A batch saves the per-request HTTP, admission and job round trips; the
+    pixel work is per texture either way, so it is no faster per texture
+    than the same textures requested one at a time.
+    """
+    try:
+        data = request.json or {}
+        specs = [parse_texture_request(spec) for spec in data.get('textures', [])]
+        
+        if not specs:
+            return jsonify({'success': False, 'error': 'No textures requested'}), 400
+            
+        if len(specs) > TEXTURE_BATCH_MAX_SPECS:
+            return jsonify({
+                'success': False,
+                'error': f"At most {TEXTURE_BATCH_MAX_SPECS} textures per batch"
+            }), 400
+            
+        logger.info(f"Generating texture batch of {len(specs)}")
+        
+        options = parse_texture_options(data, request.accept_mimetypes)
+        options['inline'] = False
+        
+        job_id = submit_texture_batch_job(specs, options)
+        return wait_for_job_response(job_id, lambda result: jsonify({
+            'success': True,
+            'count': len(result),
+            'textures': result
+        }))
+        
+    except AdmissionRejected as e:
+        return busy_response(e)
+        
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
+    except Exception as e:
+        logger.error(f"Error in generate_textures: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@texture_bp.route('/api/generate-atlas', methods=['POST'])
+def generate_atlas():
+    """Generate a set of textures packed into one atlas image, returned with a UV rectangle per texture
+    
+    Each entry of 'textures' takes the generate-texture parameters and an
+    optional 'name' (default: its index); 'padding' sets the wrapped border
+    around each tile. UV rectangles are [u0, v0, u1, v1] with v measured
+    from the bottom, as three.js samples flipped textures.
+    """
+    try:
+        data = request.json or {}
+        entries = data.get('textures', [])
+        
+        if not entries:
+            return jsonify({'success': False, 'error': 'No textures requested'}), 400
+            
+        if len(entries) > TEXTURE_BATCH_MAX_SPECS:
+            return jsonify({
+                'success': False,
+                'error': f"At most {TEXTURE_BATCH_MAX_SPECS} textures per atlas"
+            }), 400
+            
+        specs = [parse_texture_request(entry) for entry in entries]
+        names = [str(entry.get('name', index)) for index, entry in enumerate(entries)]
+        padding = int(data.get('padding', ATLAS_PADDING))
+        if not 0 <= padding <= ATLAS_MAX_PADDING:
+            raise ValueError(f"Atlas padding must be between 0 and {ATLAS_MAX_PADDING}")
+            
+        logger.info(f"Generating texture atlas of {len(specs)}")
+        
+        options = parse_texture_options(data, request.accept_mimetypes)
+        options.update(inline=False, levels=False, maps=False, variants=1)
+        
+        job_id = submit_texture_atlas_job(specs, padding, options)
+        return wait_for_job_response(job_id, lambda result: jsonify(dict(result, textures=[
+            dict(rect, name=name) for rect, name in zip(result['textures'], names)
+        ])))
+        
+    except AdmissionRejected as e:
+        return busy_response(e)
+        
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
+    except Exception as e:
+        logger.error(f"Error in generate_atlas: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@texture_bp.route('/api/texture-jobs', methods=['POST'])
+def create_texture_job():
+    """Queue a texture generation job and return its id immediately"""
+    try:
+        prompt, style, resolution, category = parse_texture_request(request.json)
+        options = parse_texture_options(request.json, request.accept_mimetypes)
+        options['inline'] = False  # job results are always JSON
+        g.metric_labels = metric_labels(resolution, category)
+        
+        job_id = submit_texture_job(prompt, style, resolution, category, options)
+        
+        return jsonify(job_payload(texture_jobs.get(job_id))), 202
+        
+    except AdmissionRejected as e:
+        return busy_response(e)
+        
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+        
+    except Exception as e:
+        logger.error(f"Error in create_texture_job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@texture_bp.route('/api/texture-jobs/<job_id>', methods=['GET'])
+def get_texture_job(job_id):
+    """Texture job status; ?wait=<seconds> long-polls until the job finishes"""
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), TEXTURE_JOB_MAX_WAIT)
+        
+        job = texture_jobs.get(job_id, wait=wait)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+            
+        return jsonify(job_payload(job))
+        
+    except Exception as e:
+        logger.error(f"Error in get_texture_job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@texture_bp.route('/api/analyze-plant', methods=['POST'])
 def analyze_plant():
     """Computer vision plant health analysis endpoint"""
     try:
@@ -425,17 +2321,19 @@ def analyze_plant():
             'error': str(e)
         }), 500
 
-@app.route('/api/get-preset-prompts', methods=['GET'])
+@texture_bp.route('/api/get-preset-prompts', methods=['GET'])
 def get_preset_prompts():
-    """Get preset prompts for different categories"""
+    """Get preset prompts for different categories
+    
+    'baked' holds the pre-baked texture URLs of every preset by style,
+    resolution and format (null until bake_presets.py has run).
+    """
     try:
+        generator = get_texture_generator()
         return jsonify({
             'success': True,
-            'prompts': {
-                'cannabis': texture_generator.cannabis_prompts,
-                'avatar': texture_generator.avatar_prompts,
-                'environment': texture_generator.environment_prompts
-            }
+            'prompts': generator.preset_prompts(),
+            'baked': preset_manifest.presets()
         })
         
     except Exception as e:
@@ -445,21 +2343,111 @@ def get_preset_prompts():
             'error': str(e)
         }), 500
 
-@app.route('/api/health', methods=['GET'])
+@texture_bp.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (never waits for the warmup)"""
+    generator = texture_generator
     return jsonify({
         'status': 'healthy',
         'service': 'CannaVille Pro AI Texture Generator',
         'version': '2.0.0',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'warmup': dict(warmup_status),
+        'texture_cache': generator.texture_cache.stats() if generator is not None else None,
+        'texture_jobs': texture_jobs.stats(),
+        'buffer_pool': buffer_pool_stats(),
+        'preset_manifest': preset_manifest.stats(),
+        'flights': dict(host_flights.stats(), inflight=len(inflight_jobs)),
+        'admission': admission.stats(),
+        'asset_variants': variant_cache.stats(),
+        'blobs': blob_store.stats(),
+        'static_responses': static_responder.stats()
     })
 
-@app.route('/assets/<path:filename>')
+@texture_bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Pipeline stage and request timings and cache/fallback counters, in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def variant_params(path, args):
+    """Variant cache key, format and encoder params selected by the w, fmt and q query parameters
+    
+    Raises ValueError for invalid parameters and OSError if the asset does not exist.
+    """
+    st = os.stat(path)
+    fmt = negotiate_format(None, args['fmt']) if args.get('fmt') else extension_format(path)
+    if fmt is None:
+        raise ValueError("Only images have resized variants")
+    params = dict(get_profile(fmt)['params'])
+    
+    width = 0
+    if args.get('w'):
+        width = int(args['w'])
+        if width <= 0:
+            raise ValueError("Variant width must be positive")
+        width = max(VARIANT_MIN_WIDTH, 1 << (width - 1).bit_length())
+        
+    quality = None
+    if args.get('q') and 'quality' in params:
+        quality = min(100, max(VARIANT_QUALITY_STEP, round(int(args['q']) / VARIANT_QUALITY_STEP) * VARIANT_QUALITY_STEP))
+        params['quality'] = quality
+        
+    return (path, st.st_mtime_ns, st.st_size, width, fmt, quality), fmt, params
+
+def asset_variant_response(path, args):
+    """Serve the resized variant of an asset, rendering it into the variant cache on first request
+    
+    Widths at or above the asset's own only re-encode it. A variant that
+    could not be cached is served from memory.
+    """
+    key, fmt, params = variant_params(path, args)
+    profile = get_profile(fmt)
+    
+    # Variants of a blob are as immutable as the blob itself
+    immutable = blob_store.owns(path)
+    cached = variant_cache.get(key, profile['extension'])
+    if cached is not None:
+        metrics.inc('texture_variants_total', result='hit')
+        return static_responder.send(cached, request, mimetype=profile['mimetype'], immutable=immutable)
+
+    metrics.inc('texture_variants_total', result='miss')
+    data = encode_image(load_resized(path, key[3], VARIANT_REDUCING_GAP), profile['pil_format'], **params)
+    
+    stored = variant_cache.put(key, profile['extension'], data)
+    if stored is None:
+        return Response(data, mimetype=profile['mimetype'])
+    return static_responder.send(stored, request, mimetype=profile['mimetype'], immutable=immutable)
+
+@texture_bp.route('/assets/<path:filename>')
 def serve_assets(filename):
-    """Serve generated assets"""
+    """Serve generated assets, preferring a WebP/AVIF sibling the client accepts
+    
+    The w (width), fmt and q (quality) query parameters select a resized or
+    re-encoded variant, rendered once and then served from the variant cache.
+    Responses carry strong ETags (If-None-Match is answered with 304) and
+    support byte ranges; blobs, whose names are their content digests, are
+    cached by clients as immutable.
+    """
     try:
-        return send_file(f"assets/{filename}")
+        path = safe_join('assets', filename)
+        if path is None:
+            raise FileNotFoundError(filename)
+        if blob_store.owns(path):
+            blob_store.touch(path)
+        elif blob_store.covers(path):
+            # Blobs being written or collected
+            raise FileNotFoundError(filename)
+
+        if any(request.args.get(name) for name in ('w', 'fmt', 'q')):
+            return asset_variant_response(path, request.args)
+            
+        immutable = blob_store.owns(path)
+        path = negotiate_sibling(path, request.accept_mimetypes)
+        response = static_responder.send(path, request, immutable=immutable)
+        response.vary.add('Accept')
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error serving asset {filename}: {str(e)}")
         return jsonify({'error': 'Asset not found'}), 404
@@ -468,18 +2456,6 @@ if __name__ == '__main__':
     logger.info("Starting CannaVille Pro AI Texture Generator...")
     logger.info("Service will be available at http://localhost:5000")
     
-    # Create a simple test texture on startup
-    try:
-        test_texture = texture_generator.generate_texture(
-            "test cannabis bud texture", 
-            "photorealistic", 
-            512, 
-            "cannabis"
-        )
-        test_texture.save("assets/textures/ai_generated/startup_test.jpg")
-        logger.info("Startup test texture generated successfully")
-    except Exception as e:
-        logger.warning(f"Startup test failed: {str(e)}")
-    
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server (FLASK_DEBUG=1 for the debugger); production runs wsgi.py under gunicorn
+    create_app().run(host='0.0.0.0', port=5000)
 
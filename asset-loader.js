@@ -392,6 +392,51 @@ class CannaVilleAssetLoader {
         });
     }
     
+    /**
+     * Load only the mip level of a generated texture needed for a LOD level
+     * @param {Array} mipLevels - mipLevels from /api/generate-texture, largest first
+     * @param {number} lodLevel - LOD level (0, 1, 2); each level halves the size
+     * @returns {Promise<Texture>} Loaded texture
+     */
+    loadTextureLevel(mipLevels, lodLevel = 0) {
+        const index = Math.min(lodLevel, mipLevels.length - 1);
+        const url = mipLevels[index].url;
+
+        if (this.cache.has(url)) {
+            return Promise.resolve(this.cache.get(url));
+        }
+
+        return new Promise((resolve, reject) => {
+            this.textureLoader.load(url, (texture) => {
+                texture.wrapS = texture.wrapT = THREE.RepeatWrapping;
+                this.cache.set(url, texture);
+                resolve(texture);
+            }, undefined, reject);
+        });
+    }
+
+    /**
+     * Apply the PBR maps of a generated texture to a material
+     * @param {MeshStandardMaterial} material - Material to update
+     * @param {Object} maps - maps from /api/generate-texture with maps=true
+     * @returns {Promise<MeshStandardMaterial>} The material, once its maps are loaded
+     */
+    applyTextureMaps(material, maps) {
+        const load = (url) => this.loadTextureLevel([{ url }]);
+
+        return Promise.all([load(maps.normal), load(maps.orm)]).then(([normalMap, orm]) => {
+            // One ORM texture serves occlusion (R), roughness (G) and metalness (B)
+            material.normalMap = normalMap;
+            material.aoMap = orm;
+            material.roughnessMap = orm;
+            material.metalnessMap = orm;
+            material.roughness = 1.0;
+            material.metalness = 1.0;
+            material.needsUpdate = true;
+            return material;
+        });
+    }
+
     /**
      * Update performance statistics
      * @param {Object3D} model - Loaded model
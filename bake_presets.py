@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+CannaVille Pro - Preset Texture Baker
+Renders every preset prompt at every resolution, style and format across all cores, into the
+texture cache and asset directory, and writes the manifest /api/get-preset-prompts serves
+Usage: python3 bake_presets.py [--resolutions 512,1024] [--styles photorealistic,cartoon]
+                               [--formats jpeg,webp] [--workers N] [--no-levels] [--force]
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from texture_presets import PRESET_MANIFEST_VERSION, manifest_variants, payload_files, read_manifest, write_manifest
+from wsgi import load_generator_module
+
+
+def csv_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def parse_args(module, argv):
+    parser = argparse.ArgumentParser(description="Pre-bake the preset textures and their manifest")
+    parser.add_argument('--resolutions', type=csv_list, default=list(module.TEXTURE_RESOLUTIONS),
+                        help="comma-separated resolutions (default: all)")
+    parser.add_argument('--styles', type=csv_list, default=list(module.TEXTURE_STYLES),
+                        help="comma-separated styles (default: all)")
+    parser.add_argument('--formats', type=csv_list, default=[module.DEFAULT_FORMAT],
+                        help=f"comma-separated formats (default: {module.DEFAULT_FORMAT})")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--no-levels', dest='levels', action='store_false',
+                        help="skip the mip chain (baked textures then only answer requests without levels)")
+    parser.add_argument('--force', action='store_true',
+                        help="re-render textures the manifest already holds")
+    parser.add_argument('--manifest', default=module.PRESET_MANIFEST_PATH,
+                        help=f"manifest path (default: {module.PRESET_MANIFEST_PATH})")
+    args = parser.parse_args(argv)
+
+    try:
+        args.resolutions = [int(resolution) for resolution in args.resolutions]
+        args.formats = [module.negotiate_format(None, fmt) for fmt in args.formats]
+    except ValueError as e:
+        parser.error(str(e))
+    for resolution in args.resolutions:
+        if resolution not in module.TEXTURE_RESOLUTIONS:
+            parser.error(f"Unsupported resolution {resolution}; available: {', '.join(map(str, module.TEXTURE_RESOLUTIONS))}")
+    for style in args.styles:
+        if style not in module.TEXTURE_STYLES:
+            parser.error(f"Unsupported style {style}; available: {', '.join(module.TEXTURE_STYLES)}")
+    return args
+
+
+def preset_variants(module, resolutions, styles, formats):
+    """(group, name, prompt, style, resolution, fmt) for every selected variant the service can serve"""
+    variants = []
+    for group, prompts in module.get_texture_generator().preset_prompts().items():
+        for name, prompt in prompts.items():
+            for style in styles:
+                for resolution in resolutions:
+                    for fmt in formats:
+                        try:
+                            module.check_texture_options(resolution, {'format': fmt})
+                        except ValueError as e:
+                            print(f"Skipping {group}/{name} {style} {resolution} {fmt}: {str(e)}")
+                            continue
+                        variants.append((group, name, prompt, style, resolution, fmt))
+    return variants
+
+
+def reusable_payloads(module, manifest, levels):
+    """Payloads of an earlier bake (same noise source) that still match a current preset and whose files all exist"""
+    prompts = module.get_texture_generator().preset_prompts()
+    reusable = {}
+    if (manifest or {}).get('noise_source') != module.NOISE_SOURCE:
+        return reusable
+    for group, name, preset, style, resolution, fmt, payload in manifest_variants(manifest):
+        if prompts.get(group, {}).get(name) != preset['prompt']:
+            continue
+        if levels and 'mipLevels' not in payload:
+            continue
+        if all(os.path.isfile(path) for path in payload_files(payload)):
+            reusable[(group, name, style, resolution, fmt)] = payload
+    return reusable
+
+
+def bake(module, variants, workers, levels=True, previous=None, force=False):
+    """Render the variants in a process pool and return ({variant key: payload}, failures)
+
+    Variants already in the previous manifest are reused unless force is
+    set; texture cache hits are saved without rendering. Everything rendered
+    is stored in the texture cache, like a served request. Largest
+    resolutions are queued first so the pool stays busy to the end.
+    """
+    generator = module.get_texture_generator()
+    payloads = {} if force else reusable_payloads(module, previous, levels)
+    failures = 0
+
+    pending = []
+    for group, name, prompt, style, resolution, fmt in variants:
+        key = (group, name, style, resolution, fmt)
+        if key in payloads:
+            continue
+        options = {'format': fmt, 'levels': levels}
+        cached = generator.get_cached_texture(prompt, style, resolution, group, options)
+        if cached is not None:
+            payloads[key] = module.save_texture(prompt, style, resolution, group, cached, options)
+        else:
+            pending.append((key, prompt, options))
+
+    print(f"{len(variants)} variants: {len(variants) - len(pending)} baked or cached, {len(pending)} to render")
+    pending.sort(key=lambda item: -item[0][3])
+
+    # Job workers are forked, so they inherit the loaded generator module
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for key, prompt, options in pending:
+            group, name, style, resolution, fmt = key
+            future = executor.submit(module.run_texture_job, prompt, style, resolution, group, options)
+            futures[future] = (key, prompt, options)
+
+        for done, future in enumerate(as_completed(futures), 1):
+            key, prompt, options = futures[future]
+            group, name, style, resolution, fmt = key
+            label = f"[{done}/{len(pending)}] {group}/{name} {style} {resolution}px {fmt}"
+            try:
+                outputs, cacheable = future.result()[0]
+                if not cacheable and resolution < module.TILED_MIN_RESOLUTION:
+                    # A fallback texture: leave the preset to on-demand generation
+                    raise RuntimeError("generation fell back to a placeholder texture")
+                if cacheable:
+                    generator.cache_texture(prompt, style, resolution, group, outputs, options)
+                payloads[key] = module.save_texture(prompt, style, resolution, group, outputs, options)
+                print(f"{label} ({time.perf_counter() - started:.1f}s elapsed)")
+            except Exception as e:
+                failures += 1
+                print(f"{label} FAILED: {str(e)}")
+
+    return payloads, failures
+
+
+def build_manifest(module, payloads, levels):
+    """Manifest of the baked textures by group, preset name, style, resolution and format"""
+    prompts = module.get_texture_generator().preset_prompts()
+    presets = {}
+    for (group, name, style, resolution, fmt), payload in sorted(payloads.items()):
+        preset = presets.setdefault(group, {}).setdefault(name, {
+            'prompt': prompts[group][name],
+            'category': group,
+            'textures': {}
+        })
+        preset['textures'].setdefault(style, {}).setdefault(str(resolution), {})[fmt] = payload
+
+    return {
+        'version': PRESET_MANIFEST_VERSION,
+        'baked': datetime.now().isoformat(),
+        'levels': levels,
+        'noise_source': module.NOISE_SOURCE,
+        'presets': presets
+    }
+
+
+def manifest_files(manifest):
+    return {path for *_, payload in manifest_variants(manifest) for path in payload_files(payload)}
+
+
+def release_unreferenced(module, previous, manifest):
+    """Reference the new manifest's blobs and release those of an earlier bake it no longer refers to
+
+    Referenced blobs are never garbage collected; released ones are left to
+    the blob store's collector. Files of bakes from before the blob store
+    are deleted.
+    """
+    keep = manifest_files(manifest)
+    stale = manifest_files(previous) - keep
+    module.blob_store.reference(keep - manifest_files(previous), 1)
+    module.blob_store.reference(stale, -1)
+
+    removed = 0
+    for path in stale:
+        if not module.blob_store.owns(path) and os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+    return len(stale), removed
+
+
+def main():
+    """Bake the selected variants and write the manifest (earlier entries outside the selection are kept)"""
+    module = load_generator_module()
+    args = parse_args(module, sys.argv[1:])
+
+    start = time.perf_counter()
+    previous = read_manifest(args.manifest)
+    variants = preset_variants(module, args.resolutions, args.styles, args.formats)
+    payloads, failures = bake(module, variants, args.workers, args.levels, previous, args.force)
+
+    # Keep earlier entries for variants outside this run's selection
+    if previous is not None:
+        for key, payload in reusable_payloads(module, previous, args.levels).items():
+            payloads.setdefault(key, payload)
+
+    manifest = build_manifest(module, payloads, args.levels)
+    write_manifest(args.manifest, manifest)
+    released, removed = release_unreferenced(module, previous, manifest)
+
+    print(f"Wrote {args.manifest} ({len(payloads)} textures, {released} stale files released, {removed} removed) "
+          f"in {time.perf_counter() - start:.1f}s")
+    if failures:
+        print(f"{failures} variant(s) failed; they are generated on demand")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+CannaVille Pro - Noise Bank Builder
+Precomputes the memory-mapped noise bank the texture generator reads instead of drawing fresh noise
+Usage: python3 build_noise_bank.py [directory]
+"""
+
+import sys
+import time
+
+from texture_noise import NOISE_BANK_DIR, build_noise_bank
+
+
+def main():
+    """Build the bank in the given directory (TEXTURE_NOISE_BANK_DIR by default)"""
+    directory = sys.argv[1] if len(sys.argv) > 1 else NOISE_BANK_DIR
+
+    start = time.perf_counter()
+    for path in build_noise_bank(directory):
+        print(f"Wrote {path}")
+    print(f"Noise bank built in {time.perf_counter() - start:.1f}s; restart the texture service to map it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,8 +7,11 @@ import os
 import json
 import subprocess
 from datetime import datetime
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify, abort
 from flask_cors import cross_origin
+from werkzeug.security import safe_join
+
+from texture_static import StaticResponder
 
 cannaville_bp = Blueprint('cannaville', __name__)
 
@@ -17,6 +20,9 @@ API_VERSION = "1.0.0"
 TEXTURE_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'static', 'generated_textures')
 ANALYSIS_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'static', 'analysis_results')
 
+# Conditional responses for served textures, with their ETags cached per file
+static_responder = StaticResponder()
+
 # Create output directories
 os.makedirs(TEXTURE_OUTPUT_DIR, exist_ok=True)
 os.makedirs(ANALYSIS_OUTPUT_DIR, exist_ok=True)
@@ -73,8 +79,14 @@ def generate_texture():
 @cannaville_bp.route('/textures/<filename>')
 @cross_origin()
 def serve_texture(filename):
-    """Serve generated texture files"""
-    return send_from_directory(TEXTURE_OUTPUT_DIR, filename)
+    """Serve generated texture files (with ETags for revalidation, and byte ranges)"""
+    path = safe_join(TEXTURE_OUTPUT_DIR, filename)
+    if path is None:
+        abort(404)
+    try:
+        return static_responder.send(path, request)
+    except OSError:
+        abort(404)
 
 @cannaville_bp.route('/analyze-plant', methods=['POST'])
 @cross_origin()
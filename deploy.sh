@@ -6,19 +6,30 @@ echo "🌱 Deploying CannaVille Pro..."
 # Install dependencies
 echo "📦 Installing dependencies..."
 npm install
-pip3 install -r requirements.txt
+pip3 install -r requirements.txt gunicorn
 
 # Create necessary directories
 mkdir -p assets/{models,textures/ai_generated,sounds,shaders}
 mkdir -p logs
 
+# Precompute the shared texture noise bank
+echo "🎲 Building texture noise bank..."
+python3 api/build_noise_bank.py assets/textures/noise_bank
+
+# Pre-bake the preset textures (incremental: unchanged presets are kept)
+echo "🖼️ Baking preset textures..."
+python3 api/bake_presets.py
+
 # Download base models (you'll need to provide these)
 echo "📥 Downloading base models..."
 # wget -O assets/models/avatars/male_caucasian.glb "YOUR_MODEL_URL"
 
-# Start AI texture generation service
+# Start AI texture generation service: the app is built and warmed once, then forked into
+# the workers; threads serve the requests that wait on texture jobs
 echo "🤖 Starting AI services..."
-python3 api/ai-texture-generator.py &
+TEXTURE_WARMUP=sync gunicorn --preload --pythonpath api --bind 0.0.0.0:5000 \
+    --workers "${TEXTURE_HTTP_WORKERS:-2}" --threads "${TEXTURE_HTTP_THREADS:-8}" --timeout 180 \
+    'wsgi:create_app()' &
 AI_PID=$!
 
 # Start main server
@@ -0,0 +1,2 @@
+def pytest_configure(config):
+    config.addinivalue_line('markers', "slow: large-resolution cases (deselect with -m 'not slow')")
@@ -0,0 +1,48 @@
+"""
+Peak memory tests for the CannaVille Pro texture pipeline
+Traces build_texture for every benchmark case and fails when a resolution's
+peak passes its PEAK_MEMORY_CEILINGS entry (python3 benchmark_textures.py memory
+prints the same measurements as a table)
+"""
+
+import os
+import sys
+import tracemalloc
+import importlib.util
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_textures import BENCHMARK_CASES, GENERATOR_PATH, PEAK_MEMORY_CEILINGS
+
+
+@pytest.fixture(scope='module')
+def generator(tmp_path_factory):
+    """The texture generator, with the service's asset and data directories in a scratch directory"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('cannaville'))
+    try:
+        module = sys.modules.get('ai_texture_generator')
+        if module is None:
+            spec = importlib.util.spec_from_file_location('ai_texture_generator', GENERATOR_PATH)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules['ai_texture_generator'] = module
+            spec.loader.exec_module(module)
+        yield module.get_texture_generator()
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.mark.parametrize('resolution', [512, 1024, pytest.param(2048, marks=pytest.mark.slow)])
+@pytest.mark.parametrize('prompt,category', BENCHMARK_CASES)
+def test_build_texture_peak_memory(generator, resolution, prompt, category):
+    tracemalloc.start()
+    try:
+        generator.build_texture(prompt, 'photorealistic', resolution, category)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    ceiling = PEAK_MEMORY_CEILINGS[resolution]
+    assert peak <= ceiling, f"{category} at {resolution}px peaked at {peak / 2**20:.1f} MB (ceiling {ceiling / 2**20:.0f} MB)"
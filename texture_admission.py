@@ -0,0 +1,128 @@
+"""
+Texture admission control for CannaVille Pro
+Admits texture work against memory and CPU budgets, so a burst of large
+requests queues briefly and is then turned away instead of exhausting memory
+"""
+
+import math
+import time
+import threading
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """Raised when work could not be admitted within the wait limit"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    __slots__ = ('memory', 'cpu')
+
+    def __init__(self, memory, cpu):
+        self.memory = memory
+        self.cpu = cpu
+
+
+class AdmissionController:
+    def __init__(self, memory_budget, cpu_budget, workers=1, max_wait=2.0, max_waiting=64):
+        """Admit work while its estimated memory (bytes) and CPU time (seconds) fit the budgets
+
+        Work that does not fit waits in FIFO order for up to max_wait
+        seconds, with at most max_waiting requests waiting; a single item
+        larger than a budget is admitted when nothing else is. workers is
+        the parallelism the CPU budget drains at, used for Retry-After.
+        """
+        self.memory_budget = memory_budget
+        self.cpu_budget = cpu_budget
+        self.workers = max(1, workers)
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._memory = 0
+        self._cpu = 0.0
+        self._admitted = 0
+
+        self.counters = {
+            'admitted': 0,
+            'queued': 0,
+            'rejected': 0
+        }
+
+    def _fits(self, ticket):
+        """Whether the ticket fits the remaining budget (lock held)"""
+        if self._admitted == 0:
+            return True
+        return (self._memory + ticket.memory <= self.memory_budget and
+                self._cpu + ticket.cpu <= self.cpu_budget)
+
+    def _grant(self, ticket):
+        self._memory += ticket.memory
+        self._cpu += ticket.cpu
+        self._admitted += 1
+
+    def _reject(self, reason):
+        self.counters['rejected'] += 1
+        retry_after = self.retry_after()
+        raise AdmissionRejected(f"Texture service is busy ({reason}); retry in {retry_after}s", retry_after)
+
+    def admit(self, memory, cpu):
+        """Reserve budget for one piece of work and return its ticket for release()
+
+        Raises AdmissionRejected if it does not fit within max_wait seconds.
+        """
+        ticket = AdmissionTicket(memory, cpu)
+        with self._cond:
+            if not self._waiting and self._fits(ticket):
+                self._grant(ticket)
+                self.counters['admitted'] += 1
+                return ticket
+
+            if len(self._waiting) >= self.max_waiting:
+                self._reject(f"{len(self._waiting)} requests waiting")
+
+            deadline = time.monotonic() + self.max_wait
+            self._waiting.append(ticket)
+            try:
+                while self._waiting[0] is not ticket or not self._fits(ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject("memory or CPU budget in use")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+
+            self._grant(ticket)
+            self.counters['queued'] += 1
+        return ticket
+
+    def release(self, ticket):
+        """Return an admitted ticket's budget"""
+        with self._cond:
+            self._memory -= ticket.memory
+            self._cpu -= ticket.cpu
+            self._admitted -= 1
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """Seconds until the admitted CPU work should have drained, at least 1"""
+        return max(1, math.ceil(self._cpu / self.workers))
+
+    def stats(self):
+        """Counters, budgets and what is admitted or waiting right now"""
+        with self._cond:
+            stats = dict(self.counters)
+            stats.update({
+                'waiting': len(self._waiting),
+                'in_flight': self._admitted,
+                'memory_bytes': self._memory,
+                'memory_budget': self.memory_budget,
+                'cpu_seconds': round(self._cpu, 3),
+                'cpu_budget': self.cpu_budget
+            })
+        return stats
@@ -0,0 +1,124 @@
+"""
+Texture atlas packing for CannaVille Pro
+Skyline bin packing of textures into one power-of-two atlas, with wrapped
+padding so mip levels of a tile never sample its neighbours
+"""
+
+import numpy as np
+
+
+def skyline_pack(sizes, width, height):
+    """Place (w, h) rectangles in a width x height bin with the skyline bottom-left rule
+
+    Rectangles are placed largest first, each at the lowest (then leftmost)
+    position on the skyline where it fits. Returns a list of (x, y) in the
+    order of sizes, or None if they do not all fit.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+
+    # Skyline segments (x, width, y) covering the bin from left to right
+    skyline = [(0, width, 0)]
+    for index in order:
+        w, h = sizes[index]
+        best = None
+        for start in range(len(skyline)):
+            x = skyline[start][0]
+            if x + w > width:
+                break
+            # Resting height: the highest segment under [x, x + w)
+            y = 0
+            covered = 0
+            end = start
+            while covered < w:
+                y = max(y, skyline[end][2])
+                covered += skyline[end][1] - (x - skyline[end][0] if end == start else 0)
+                end += 1
+            if y + h <= height and (best is None or (y, x) < best[:2]):
+                best = (y, x)
+        if best is None:
+            return None
+
+        y, x = best
+        positions[index] = (x, y)
+        skyline = raise_skyline(skyline, x, w, y + h)
+
+    return positions
+
+
+def raise_skyline(skyline, x, w, top):
+    """Skyline with [x, x + w) raised to top, merging level neighbours"""
+    raised = []
+    for sx, sw, sy in skyline:
+        if sx + sw <= x or sx >= x + w:
+            raised.append((sx, sw, sy))
+            continue
+        if sx < x:
+            raised.append((sx, x - sx, sy))
+        if sx + sw > x + w:
+            raised.append((x + w, sx + sw - x - w, sy))
+    raised.append((x, w, top))
+    raised.sort()
+
+    merged = [raised[0]]
+    for sx, sw, sy in raised[1:]:
+        px, pw, py = merged[-1]
+        if py == sy:
+            merged[-1] = (px, pw + sw, py)
+        else:
+            merged.append((sx, sw, sy))
+    return merged
+
+
+def atlas_sizes(area, max_size):
+    """Power-of-two (width, height) candidates up to max_size holding area, smallest first
+
+    Widths are at most twice the height, as GPUs and three.js prefer near-square textures.
+    """
+    candidates = []
+    height = 1
+    while height <= max_size:
+        for width in (height, height * 2):
+            if width <= max_size and width * height >= area:
+                candidates.append((width, height))
+        height *= 2
+    return sorted(candidates, key=lambda size: (size[0] * size[1], size[0]))
+
+
+def pack_atlas(sizes, padding, max_size):
+    """Pack square tiles of the given sizes, each with padding on every side
+
+    Returns (width, height, positions) where positions are the (x, y) of
+    each tile's content (inside its padding). Raises ValueError if they do
+    not fit in max_size x max_size.
+    """
+    padded = [(size + 2 * padding, size + 2 * padding) for size in sizes]
+    for width, height in atlas_sizes(sum(w * h for w, h in padded), max_size):
+        positions = skyline_pack(padded, width, height)
+        if positions is not None:
+            return width, height, [(x + padding, y + padding) for x, y in positions]
+
+    raise ValueError(f"Textures do not fit in a {max_size}x{max_size} atlas")
+
+
+def blit_wrapped(atlas, tile, x, y, padding):
+    """Copy tile into atlas at (x, y) and fill its padding by wrapping the tile around
+
+    The textures tile seamlessly, so wrapped padding continues the pattern
+    and repeat-mode sampling near the tile's edges stays correct.
+    """
+    h, w = tile.shape[:2]
+    atlas[y:y + h, x:x + w] = tile
+    if not padding:
+        return
+
+    region = atlas[y - padding:y + h + padding, x - padding:x + w + padding]
+    region[:padding, padding:-padding] = tile[h - padding:]
+    region[-padding:, padding:-padding] = tile[:padding]
+    region[:, :padding] = region[:, w:w + padding]
+    region[:, -padding:] = region[:, padding:2 * padding]
+
+
+def uv_rect(x, y, size, width, height):
+    """UV rectangle [u0, v0, u1, v1] of a tile, with v measured from the bottom (three.js flipY)"""
+    return [x / width, 1 - (y + size) / height, (x + size) / width, 1 - y / height]
@@ -0,0 +1,266 @@
+"""
+Texture blob store for CannaVille Pro
+Content-addressed storage for generated files: blobs are named by the digest
+of their bytes, so identical outputs are stored once, and the least recently
+accessed unreferenced blobs are collected once the store exceeds its quota
+"""
+
+import os
+import re
+import time
+import fcntl
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Bytes hashed per read when storing a file
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Path of a blob relative to the store directory, as blob_path builds it
+BLOB_NAME = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[0-9a-z]+')
+
+# Index files, kept outside the (served) blob directory
+INDEX_FILES = ('index.sqlite3', 'index.sqlite3-wal', 'index.sqlite3-shm')
+
+
+class BlobStore:
+    def __init__(self, directory, quota, index_dir, grace=600, touch_interval=60):
+        """Store blobs under directory/ab/cd/<sha256>.<extension>, with metadata in an SQLite index in index_dir
+
+        Each blob's metadata holds its size and a reference count: blobs
+        that something long-lived points at (such as the baked preset
+        manifest) are referenced and never collected. collect() deletes
+        unreferenced blobs, least recently accessed first, while the store
+        holds more than quota bytes; blobs accessed within grace seconds
+        are spared. Access times are the files' atimes, refreshed by
+        touch() at most every touch_interval seconds. The directory may be
+        served to clients, so the index and the collection lock live in
+        index_dir.
+        """
+        self.directory = directory
+        self.quota = quota
+        self.index_dir = index_dir
+        self.grace = grace
+        self.touch_interval = touch_interval
+        self.index_path = os.path.join(index_dir, INDEX_FILES[0])
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counters = {
+            'stored': 0,
+            'deduplicated': 0,
+            'collected': 0,
+            'collected_bytes': 0
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(index_dir, exist_ok=True)
+        self._move_old_index()
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS blobs ('
+                       'path TEXT PRIMARY KEY, size INTEGER NOT NULL, refs INTEGER NOT NULL DEFAULT 0, '
+                       'created REAL NOT NULL)')
+
+    @contextmanager
+    def _connect(self):
+        """A transaction on this thread's connection; connections are never shared across threads or forks"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.index_path, timeout=30)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        with db:
+            yield db
+
+    def _move_old_index(self):
+        """Move an index that earlier versions kept inside the blob directory to index_dir"""
+        if os.path.exists(self.index_path) or not os.path.exists(os.path.join(self.directory, INDEX_FILES[0])):
+            return
+        for name in INDEX_FILES:
+            if os.path.exists(os.path.join(self.directory, name)):
+                os.replace(os.path.join(self.directory, name), os.path.join(self.index_dir, name))
+        if os.path.exists(os.path.join(self.directory, 'collect.lock')):
+            os.remove(os.path.join(self.directory, 'collect.lock'))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def blob_path(self, digest, extension):
+        return os.path.join(self.directory, digest[:2], digest[2:4], f"{digest}.{extension}")
+
+    def _relative(self, path):
+        """path relative to the store directory, or None if it lies outside"""
+        relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.directory))
+        if relative == os.curdir or relative.split(os.sep)[0] == os.pardir:
+            return None
+        return relative
+
+    def _indexed(self, path):
+        """The index's form of a blob's path (as blob_path builds it), or None if path names no blob"""
+        relative = self._relative(path)
+        if relative is None or not BLOB_NAME.fullmatch(relative.replace(os.sep, '/')):
+            return None
+        return os.path.join(self.directory, relative)
+
+    def owns(self, path):
+        """Whether path names a blob of this store"""
+        return self._indexed(path) is not None
+
+    def covers(self, path):
+        """Whether path lies inside the store directory (a blob or one being written or collected)"""
+        return self._relative(path) is not None
+
+    def put(self, data, extension):
+        """Store encoded bytes and return the blob's path"""
+        path = self.blob_path(hashlib.sha256(data).hexdigest(), extension)
+        if not self._existing(path):
+            partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, path)
+            self._count('stored')
+        self._record(path, len(data))
+        return path
+
+    def put_file(self, source, extension):
+        """Move a file (on the same filesystem) into the store and return the blob's path"""
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                digest.update(chunk)
+
+        path = self.blob_path(digest.hexdigest(), extension)
+        if self._existing(path):
+            os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(source, path)
+            self._count('stored')
+        self._record(path, os.path.getsize(path))
+        return path
+
+    def _existing(self, path):
+        """Touch and count a blob that is already stored; False if it is not"""
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            return False
+        self._count('deduplicated')
+        return True
+
+    def _record(self, path, size):
+        """Index a stored blob (also after deduplication, in case its row was collected meanwhile)"""
+        with self._connect() as db:
+            db.execute('INSERT OR IGNORE INTO blobs (path, size, created) VALUES (?, ?, ?)', (path, size, time.time()))
+
+    def touch(self, path):
+        """Note an access to a blob (refreshes its atime if older than touch_interval)"""
+        try:
+            st = os.stat(path)
+            if time.time() - st.st_atime > self.touch_interval:
+                os.utime(path, (time.time(), st.st_mtime))
+        except OSError:
+            pass
+
+    def reference(self, paths, delta=1):
+        """Add delta (+1 or -1) to the reference counts of the blobs among paths"""
+        paths = [indexed for indexed in map(self._indexed, paths) if indexed is not None]
+        with self._connect() as db:
+            db.executemany('UPDATE blobs SET refs = MAX(0, refs + ?) WHERE path = ?', [(delta, path) for path in paths])
+
+    def _remove_unused(self, path):
+        """Delete a blob unless it was accessed within the grace period; False if it was spared
+
+        The blob is moved aside before its atime is checked again: a put()
+        that deduplicated against it either touched it before the move,
+        which spares it, or finds it missing and stores it anew.
+        """
+        doomed = f"{path}.{os.getpid()}.collect"
+        try:
+            os.rename(path, doomed)
+        except OSError:
+            return True
+        try:
+            if time.time() - os.stat(doomed).st_atime > self.grace:
+                os.remove(doomed)
+                return True
+        except OSError:
+            return True
+        # Identical bytes, should a put() have stored the blob again meanwhile
+        os.replace(doomed, path)
+        return False
+
+    def collect(self):
+        """Delete unreferenced blobs, least recently accessed first, until the store fits its quota
+
+        Only one process collects at a time; others return at once. Index
+        rows whose file has disappeared are dropped. Returns the bytes freed.
+        """
+        lock_fd = os.open(os.path.join(self.index_dir, 'collect.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            with self._connect() as db:
+                total = db.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+                if total <= self.quota:
+                    return 0
+                candidates = db.execute('SELECT path, size FROM blobs WHERE refs = 0').fetchall()
+
+            now = time.time()
+            accessed = []
+            gone = []
+            for path, size in candidates:
+                try:
+                    atime = os.stat(path).st_atime
+                except OSError:
+                    gone.append(path)
+                    total -= size
+                    continue
+                if now - atime > self.grace:
+                    accessed.append((atime, path, size))
+
+            freed = 0
+            for _, path, size in sorted(accessed):
+                if total <= self.quota:
+                    break
+                if not self._remove_unused(path):
+                    continue
+                gone.append(path)
+                total -= size
+                freed += size
+                self._count('collected')
+
+            # A blob stored again while it was collected keeps its row
+            gone = [path for path in gone if not os.path.exists(path)]
+            with self._connect() as db:
+                db.executemany('DELETE FROM blobs WHERE path = ? AND refs = 0', [(path,) for path in gone])
+            self._count('collected_bytes', freed)
+            return freed
+        finally:
+            os.close(lock_fd)
+
+    def stats(self):
+        """Counters and the store's size from the index"""
+        with self._connect() as db:
+            blobs, size, referenced = db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs > 0), 0) FROM blobs').fetchone()
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({
+            'blobs': blobs,
+            'bytes': size,
+            'referenced': referenced,
+            'quota': self.quota
+        })
+        return stats
@@ -0,0 +1,122 @@
+"""
+Texture buffer pool for CannaVille Pro
+Reusable full-resolution working arrays, so steady-state texture requests
+borrow the same buffers instead of allocating and freeing them every time
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def buffer_key(shape, dtype):
+    return tuple(shape), np.dtype(dtype).str
+
+
+def describe_key(key):
+    """Readable name of a pool key, such as '2048x2048x3 float32'"""
+    shape, dtype = key
+    return f"{'x'.join(str(size) for size in shape)} {np.dtype(dtype).name}"
+
+
+class BufferPool:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        """Create a pool keeping at most max_bytes of idle buffers, keyed by (shape, dtype)
+
+        For texture stages the shape is (resolution, resolution, channels),
+        with a leading batch axis for batched noise.
+        """
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list)
+        self._idle_bytes = 0
+        self._loans = {}
+        self._loaned_bytes = 0
+
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'discards': 0
+        }
+
+    def acquire(self, shape, dtype):
+        """Borrow an uninitialized C-contiguous array; give it back with release()"""
+        key = buffer_key(shape, dtype)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                array = idle.pop()
+                self._idle_bytes -= array.nbytes
+                self.counters['hits'] += 1
+            else:
+                array = None
+                self.counters['misses'] += 1
+
+        if array is None:
+            array = np.empty(key[0], dtype=key[1])
+
+        with self._lock:
+            self._loans[id(array)] = array.nbytes
+            self._loaned_bytes += array.nbytes
+        return array
+
+    def release(self, array):
+        """Return a borrowed array; arrays the pool did not hand out are ignored"""
+        with self._lock:
+            nbytes = self._loans.pop(id(array), None)
+            if nbytes is None:
+                return
+            self._loaned_bytes -= nbytes
+
+            if self._idle_bytes + nbytes > self.max_bytes:
+                self.counters['discards'] += 1
+                return
+            self._idle[buffer_key(array.shape, array.dtype)].append(array)
+            self._idle_bytes += nbytes
+
+    @contextmanager
+    def borrow(self, shape, dtype):
+        """Context manager around acquire() and release()"""
+        array = self.acquire(shape, dtype)
+        try:
+            yield array
+        finally:
+            self.release(array)
+
+    def reset_after_fork(self):
+        """Start a forked child with a new lock and an empty pool, acquiring nothing
+
+        The fork may have copied the lock, and the pool mid-update, while
+        another thread of the parent held it; the parent's loans belong to
+        threads that do not exist in the child.
+        """
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list)
+        self._idle_bytes = 0
+        self._loans = {}
+        self._loaned_bytes = 0
+        self.counters = dict.fromkeys(self.counters, 0)
+
+    def clear(self):
+        """Drop every idle buffer"""
+        with self._lock:
+            self._idle.clear()
+            self._idle_bytes = 0
+
+    def stats(self):
+        """Snapshot of pool counters and resident bytes (idle plus on loan)"""
+        with self._lock:
+            stats = dict(self.counters)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'hit_rate': stats['hits'] / lookups if lookups else 0.0,
+                'idle_bytes': self._idle_bytes,
+                'loaned_bytes': self._loaned_bytes,
+                'resident_bytes': self._idle_bytes + self._loaned_bytes,
+                'max_bytes': self.max_bytes,
+                'idle_buffers': {describe_key(key): len(arrays) for key, arrays in self._idle.items() if arrays}
+            })
+        return stats
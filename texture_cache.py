@@ -0,0 +1,183 @@
+"""
+Texture cache for CannaVille Pro
+Two-tier (memory + disk) LRU cache of encoded texture bytes, bounded by byte budget
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_key(prompt, style, resolution, category):
+    """Normalize a texture request into a hashable cache key"""
+    prompt = ' '.join(str(prompt).lower().split())
+    return (prompt, str(style).lower(), int(resolution), str(category).lower())
+
+
+def key_digest(key):
+    """Stable hex digest of a cache key, identical across processes"""
+    raw = '\x1f'.join(str(part) for part in key)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class TextureCache:
+    def __init__(self, memory_budget=256 * 1024 * 1024, disk_dir=None, disk_budget=2 * 1024 * 1024 * 1024):
+        """Create a cache holding at most memory_budget bytes in RAM and disk_budget bytes on disk"""
+        self.memory_budget = memory_budget
+        self.disk_dir = disk_dir
+        self.disk_budget = disk_budget
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0
+        }
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self):
+        """Index existing disk entries, oldest access first"""
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.bin'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name[:-4], st.st_size))
+
+        for _, digest, size in sorted(entries):
+            self._disk[digest] = size
+            self._disk_bytes += size
+
+        self._evict_disk()
+
+    def _disk_path(self, digest):
+        return os.path.join(self.disk_dir, f"{digest}.bin")
+
+    def get(self, key):
+        """Return cached bytes for key, or None"""
+        digest = key_digest(key)
+
+        with self._lock:
+            data = self._memory.get(digest)
+            if data is not None:
+                self._memory.move_to_end(digest)
+                self.counters['memory_hits'] += 1
+                return data
+
+            if not self.disk_dir:
+                self.counters['misses'] += 1
+                return None
+
+        # Entries missing from the index may have been written by another
+        # process sharing disk_dir, so the file is tried either way
+        try:
+            with open(self._disk_path(digest), 'rb') as f:
+                data = f.read()
+            os.utime(self._disk_path(digest))
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(digest, None)
+                if size is not None:
+                    self._disk_bytes -= size
+                self.counters['misses'] += 1
+            return None
+
+        with self._lock:
+            if digest in self._disk:
+                self._disk.move_to_end(digest)
+            else:
+                self._disk[digest] = len(data)
+                self._disk_bytes += len(data)
+                self._evict_disk()
+            self.counters['disk_hits'] += 1
+            self._store_memory(digest, data)
+
+        return data
+
+    def put(self, key, data):
+        """Store encoded bytes for key in both tiers"""
+        digest = key_digest(key)
+
+        with self._lock:
+            self._store_memory(digest, data)
+
+        if not self.disk_dir or len(data) > self.disk_budget:
+            return
+
+        path = self._disk_path(digest)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Texture cache disk write failed: {str(e)}")
+            return
+
+        with self._lock:
+            old_size = self._disk.pop(digest, None)
+            if old_size is not None:
+                self._disk_bytes -= old_size
+            self._disk[digest] = len(data)
+            self._disk_bytes += len(data)
+            self._evict_disk()
+
+    def _store_memory(self, digest, data):
+        """Insert into the memory tier and evict to budget (lock held)"""
+        if len(data) > self.memory_budget:
+            return
+
+        old = self._memory.pop(digest, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+
+        self._memory[digest] = data
+        self._memory_bytes += len(data)
+
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.counters['memory_evictions'] += 1
+
+    def _evict_disk(self):
+        """Remove least recently used disk entries until under budget (lock held)"""
+        while self._disk_bytes > self.disk_budget and self._disk:
+            digest, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.counters['disk_evictions'] += 1
+            try:
+                os.remove(self._disk_path(digest))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Snapshot of cache counters and occupancy"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'memory_budget': self.memory_budget,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+                'disk_budget': self.disk_budget if self.disk_dir else 0
+            })
+        return stats
@@ -0,0 +1,140 @@
+"""
+Texture request coalescing for CannaVille Pro
+Host-wide flight locks and published results, so the service workers on one
+host generate a texture once however many of them are asked for it at once
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class HostFlights:
+    def __init__(self, directory, stripes=4096, record_ttl=600, poll_interval=0.05):
+        """Coordinate flights through lock and result record files in directory
+
+        Locks are striped over `stripes` files by digest, so the directory
+        stays bounded; unrelated textures sharing a stripe only wait for each
+        other. flock() locks are released by the kernel if their holder dies.
+        Result records older than record_ttl seconds are pruned.
+        """
+        self.directory = directory
+        self.stripes = stripes
+        self.record_ttl = record_ttl
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+        self.counters = {
+            'acquired': 0,
+            'contended': 0,
+            'waits': 0,
+            'published': 0,
+            'reused': 0
+        }
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _stripe_path(self, digest):
+        return os.path.join(self.directory, f"{int(digest[:8], 16) % self.stripes:04x}.lock")
+
+    def _record_path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def try_acquire(self, digest):
+        """Take the flight lock for digest without blocking; returns a handle for release(), or None if held"""
+        fd = os.open(self._stripe_path(digest), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            self._count('contended')
+            return None
+        except Exception:
+            os.close(fd)
+            raise
+
+        self._count('acquired')
+        return fd
+
+    def release(self, handle):
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        os.close(handle)
+
+    def wait(self, digest, timeout):
+        """Wait until nobody holds the flight lock for digest; False on timeout"""
+        self._count('waits')
+        deadline = time.monotonic() + timeout
+        while True:
+            handle = self.try_acquire(digest)
+            if handle is not None:
+                self.release(handle)
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def publish(self, digest, payload):
+        """Record a flight's response payload for the workers that waited on it"""
+        path = self._record_path(digest)
+        partial = f"{path}.{os.getpid()}.partial"
+        try:
+            with open(partial, 'w') as f:
+                json.dump(payload, f)
+            os.replace(partial, path)
+        except OSError as e:
+            logger.warning(f"Could not publish texture flight {digest[:12]}: {str(e)}")
+            return
+
+        self._count('published')
+        self.prune()
+
+    def result(self, digest, since):
+        """The payload published for digest at or after since (a time.time()), if its texture file still exists"""
+        path = self._record_path(digest)
+        try:
+            if os.stat(path).st_mtime < since:
+                return None
+            with open(path) as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not os.path.isfile(payload['imageUrl'].lstrip('/')):
+            return None
+        self._count('reused')
+        return payload
+
+    def prune(self):
+        """Delete expired result records, scanning at most once per record_ttl / 10"""
+        now = time.time()
+        with self._lock:
+            if now - self._last_prune < self.record_ttl / 10:
+                return
+            self._last_prune = now
+
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < now - self.record_ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['directory'] = self.directory
+        return stats
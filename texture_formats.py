@@ -0,0 +1,142 @@
+"""
+Texture encoding formats for CannaVille Pro
+Per-format encoder profiles and Accept-header negotiation
+"""
+
+import os
+import json
+import logging
+from PIL import features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FORMAT = 'jpeg'
+
+# Encoder profiles: PIL format, file extension, MIME type and save() parameters
+# for full-size textures, for the extra textures of a variation set (JPEG skips the
+# Huffman optimization pass, a few percent of size for a third of the encode time)
+# and for thumbnails/mip levels
+ENCODER_PROFILES = {
+    'jpeg': {
+        'pil_format': 'JPEG',
+        'extension': 'jpg',
+        'mimetype': 'image/jpeg',
+        'params': {'quality': 95, 'optimize': True},
+        'variation_params': {'quality': 95},
+        'thumbnail_params': {'quality': 85}
+    },
+    'webp': {
+        'pil_format': 'WEBP',
+        'extension': 'webp',
+        'mimetype': 'image/webp',
+        'params': {'quality': 85, 'method': 4},
+        'variation_params': {'quality': 85, 'method': 4},
+        'thumbnail_params': {'quality': 80, 'method': 4}
+    },
+    'webp-lossless': {
+        'pil_format': 'WEBP',
+        'extension': 'webp',
+        'mimetype': 'image/webp',
+        'params': {'lossless': True, 'quality': 30, 'method': 2},
+        'variation_params': {'lossless': True, 'quality': 30, 'method': 2},
+        'thumbnail_params': {'lossless': True, 'quality': 30, 'method': 2}
+    },
+    'png': {
+        'pil_format': 'PNG',
+        'extension': 'png',
+        'mimetype': 'image/png',
+        'params': {'compress_level': 3},
+        'variation_params': {'compress_level': 3},
+        'thumbnail_params': {'compress_level': 3}
+    },
+    'avif': {
+        'pil_format': 'AVIF',
+        'extension': 'avif',
+        'mimetype': 'image/avif',
+        'params': {'quality': 70, 'speed': 8},
+        'variation_params': {'quality': 70, 'speed': 8},
+        'thumbnail_params': {'quality': 65, 'speed': 8},
+        'requires': 'avif'
+    }
+}
+
+
+def load_profile_overrides(profiles, raw):
+    """Merge JSON overrides like {"webp": {"params": {"quality": 75}}} into the profiles"""
+    if not raw:
+        return
+    try:
+        overrides = json.loads(raw)
+    except ValueError as e:
+        logger.warning(f"Ignoring invalid TEXTURE_ENCODER_PROFILES: {str(e)}")
+        return
+
+    for name, override in overrides.items():
+        if name not in profiles:
+            logger.warning(f"Ignoring encoder profile override for unknown format {name}")
+            continue
+        for field in ('params', 'variation_params', 'thumbnail_params'):
+            profiles[name][field].update(override.get(field, {}))
+
+
+load_profile_overrides(ENCODER_PROFILES, os.environ.get('TEXTURE_ENCODER_PROFILES'))
+
+# Formats whose encoder is present in this Pillow build
+AVAILABLE_FORMATS = [name for name, profile in ENCODER_PROFILES.items()
+                     if 'requires' not in profile or features.check(profile['requires'])]
+
+# Formats chosen by the Accept header (lossless variants need an explicit format field)
+NEGOTIABLE_MIMETYPES = {}
+for _name in AVAILABLE_FORMATS:
+    NEGOTIABLE_MIMETYPES.setdefault(ENCODER_PROFILES[_name]['mimetype'], _name)
+
+EXTENSION_MIMETYPES = {profile['extension']: profile['mimetype'] for profile in ENCODER_PROFILES.values()}
+
+
+def get_profile(name):
+    return ENCODER_PROFILES[name]
+
+
+def negotiate_format(accept_mimetypes, requested=None):
+    """Pick an encoding from an explicit format name, else from the Accept header
+
+    Only image types the client lists explicitly count; wildcards such as
+    */* fall back to JPEG so clients never receive a format they did not ask for.
+    """
+    if requested:
+        requested = str(requested).lower()
+        if requested == 'jpg':
+            requested = 'jpeg'
+        if requested in AVAILABLE_FORMATS:
+            return requested
+        raise ValueError(f"Unsupported format {requested}; available: {', '.join(AVAILABLE_FORMATS)}")
+
+    for mimetype, quality in accept_mimetypes or []:
+        if quality > 0 and mimetype in NEGOTIABLE_MIMETYPES:
+            return NEGOTIABLE_MIMETYPES[mimetype]
+
+    return DEFAULT_FORMAT
+
+
+def extension_format(path):
+    """Format name of an image path by its extension (WebP counts as lossy), or None"""
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension == 'jpeg':
+        extension = 'jpg'
+    return NEGOTIABLE_MIMETYPES.get(EXTENSION_MIMETYPES.get(extension))
+
+
+def negotiate_sibling(path, accept_mimetypes):
+    """Return a pre-encoded WebP/AVIF sibling of a JPEG/PNG path if the client accepts it, else path"""
+    base, extension = os.path.splitext(path)
+    if extension.lower() not in ('.jpg', '.jpeg', '.png'):
+        return path
+
+    for mimetype, quality in accept_mimetypes or []:
+        if quality <= 0 or mimetype not in ('image/avif', 'image/webp') or mimetype not in NEGOTIABLE_MIMETYPES:
+            continue
+        sibling = f"{base}.{get_profile(NEGOTIABLE_MIMETYPES[mimetype])['extension']}"
+        if os.path.isfile(sibling):
+            return sibling
+
+    return path
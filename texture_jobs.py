@@ -0,0 +1,197 @@
+"""
+Texture job manager for CannaVille Pro
+Runs texture generation in a process pool so request threads stay responsive
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised when the number of pending jobs has reached the queue depth"""
+
+
+class TextureJobManager:
+    def __init__(self, max_workers=None, queue_depth=32, job_ttl=600, finalize_workers=4):
+        """Create a manager with a lazily started pool of max_workers processes
+
+        Finished jobs are finalized on a separate pool of finalize_workers
+        threads, so a slow finalize (file and index writes) never holds up
+        the process pool's result thread and with it every other job.
+        """
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.job_ttl = job_ttl
+        self.finalize_workers = finalize_workers
+
+        self._executor = None
+        self._finalizer = None
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._pending = 0
+
+    def _get_executor(self):
+        """Start the process pool on first use, so pre-forked workers each get their own (lock held)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _get_finalizer(self):
+        """Start the finalize thread pool on first use (lock held)"""
+        if self._finalizer is None:
+            self._finalizer = ThreadPoolExecutor(max_workers=self.finalize_workers, thread_name_prefix='texture-finalize')
+        return self._finalizer
+
+    def _new_job(self, params):
+        now = time.time()
+        return {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'params': params,
+            'created': now,
+            'finished': None,
+            'result': None,
+            'error': None,
+            'future': None,
+            'event': threading.Event()
+        }
+
+    def submit(self, fn, args, finalize=None, params=None, executor=None, done=None):
+        """Queue fn(*args) in the pool and return the job id
+
+        finalize(output) runs in the parent, on the finalize thread pool, once
+        the worker returns and its return value becomes the job result. done() runs after the job has
+        finished, whether it succeeded or failed. executor runs the job in
+        place of the process pool (e.g. a thread pool for jobs that wait).
+        """
+        with self._lock:
+            self._prune()
+            if self._pending >= self.queue_depth:
+                raise JobQueueFull(f"Texture job queue is full ({self.queue_depth} pending)")
+
+            job = self._new_job(params)
+            self._jobs[job['id']] = job
+            self._pending += 1
+            executor = executor or self._get_executor()
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job['id'], None)
+                self._pending -= 1
+            raise
+
+        job['future'] = future
+        future.add_done_callback(lambda f: self._complete(job, f, finalize, done))
+        return job['id']
+
+    def add_completed(self, result, params=None):
+        """Record a job that finished without touching the pool (e.g. a cache hit)"""
+        job = self._new_job(params)
+        job['status'] = 'done'
+        job['finished'] = job['created']
+        job['result'] = result
+        job['event'].set()
+
+        with self._lock:
+            self._prune()
+            self._jobs[job['id']] = job
+        return job['id']
+
+    def _complete(self, job, future, finalize, done):
+        """Hand a finished job to the finalize pool (runs on the thread that completed the future)"""
+        with self._lock:
+            finalizer = self._get_finalizer()
+        try:
+            finalizer.submit(self._finish, job, future, finalize, done)
+        except RuntimeError:
+            # The finalize pool is shutting down
+            self._finish(job, future, finalize, done)
+
+    def _finish(self, job, future, finalize, done):
+        try:
+            output = future.result()
+            job['result'] = finalize(output) if finalize else output
+            job['status'] = 'done'
+        except Exception as e:
+            logger.error(f"Texture job {job['id']} failed: {str(e)}")
+            job['error'] = str(e)
+            job['status'] = 'failed'
+
+        with self._lock:
+            job['finished'] = time.time()
+            self._pending -= 1
+
+        # Clean up (release locks and budgets) before waking the waiters
+        if done is not None:
+            try:
+                done()
+            except Exception as e:
+                logger.error(f"Texture job {job['id']} cleanup failed: {str(e)}")
+        job['event'].set()
+
+    def is_pending(self, job_id):
+        """True while the job is queued or running"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job is not None and job['finished'] is None
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl (lock held)"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job['finished'] is not None and job['finished'] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id, wait=0):
+        """Return a snapshot of the job, waiting up to wait seconds for it to finish; None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        if wait > 0:
+            job['event'].wait(wait)
+
+        status = job['status']
+        if status == 'queued' and job['future'] is not None and job['future'].running():
+            status = 'running'
+
+        return {
+            'id': job['id'],
+            'status': status,
+            'params': job['params'],
+            'created': job['created'],
+            'finished': job['finished'],
+            'result': job['result'],
+            'error': job['error']
+        }
+
+    def stats(self):
+        """Pool configuration and occupancy"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_depth': self.queue_depth,
+                'finalize_workers': self.finalize_workers,
+                'pending': self._pending,
+                'tracked_jobs': len(self._jobs)
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the process pool, then the finalize pool once the pool's last jobs are handed to it"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        with self._lock:
+            finalizer, self._finalizer = self._finalizer, None
+        if finalizer is not None:
+            finalizer.shutdown(wait=wait)
@@ -0,0 +1,178 @@
+"""
+Texture pipeline metrics for CannaVille Pro
+Stage timing histograms and event counters, rendered in the Prometheus text format
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, from sub-millisecond stages of a
+# 512px texture to the multi-minute tiled 8192px ones
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class StageClock:
+    def __init__(self):
+        """Per-stage time summed over repeated sections, such as the bands of a tiled texture"""
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        yield
+        self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Create an empty registry; histograms share one set of bucket bounds"""
+        self.buckets = tuple(buckets)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._help = {}
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+
+    def describe(self, name, kind, help_text):
+        """Declare a metric ('histogram' or 'counter') so it renders with HELP/TYPE even before any sample"""
+        self._help[name] = (kind, help_text)
+
+    def collect(self, name, kind, help_text, read):
+        """Declare a counter or gauge kept elsewhere; read() returns its value at render time
+
+        read() returns a number, or a list of (labels dict, value) samples.
+        """
+        self._help[name] = (kind, help_text)
+        self._collectors[name] = read
+
+    @contextmanager
+    def labels(self, **labels):
+        """Add labels to every sample recorded by this thread inside the block"""
+        previous = getattr(self._local, 'labels', {})
+        self._local.labels = dict(previous, **labels)
+        try:
+            yield
+        finally:
+            self._local.labels = previous
+
+    def _key(self, name, labels):
+        return name, label_key(dict(getattr(self._local, 'labels', {}), **labels))
+
+    def observe(self, name, value, **labels):
+        """Record one histogram sample"""
+        key = self._key(name, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the wall time of the block (not recorded if it raises)"""
+        start = time.perf_counter()
+        yield
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe_clock(self, name, clock, **labels):
+        """Record each stage total of a StageClock as one sample, labeled by stage"""
+        for stage, seconds in clock.seconds.items():
+            self.observe(name, seconds, stage=stage, **labels)
+
+    def inc(self, name, amount=1, **labels):
+        """Increment a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def drain(self):
+        """Return the samples recorded since the last drain and reset, for shipping to another process"""
+        with self._lock:
+            snapshot = {'histograms': self._histograms, 'counters': self._counters}
+            self._histograms = {}
+            self._counters = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a drain() snapshot (normally from a job worker) into this registry"""
+        with self._lock:
+            for key, values in snapshot['histograms'].items():
+                histogram = self._histograms.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, value in enumerate(values):
+                    histogram[i] += value
+            for key, value in snapshot['counters'].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+
+    def reset_after_fork(self):
+        """Start a forked child with a new lock and no samples, acquiring nothing
+
+        The fork may have copied the lock while another thread of the parent
+        held it; that thread does not exist in the child to release it.
+        """
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        names = sorted(set(self._help) | {name for name, _ in histograms} | {name for name, _ in counters})
+        for name in names:
+            kind, help_text = self._help.get(name, ('histogram' if any(n == name for n, _ in histograms) else 'counter', ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+            if name in self._collectors:
+                samples = self._collectors[name]()
+                if not isinstance(samples, list):
+                    samples = [({}, samples)]
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(label_key(labels))} {format_value(value)}")
+            elif kind == 'histogram':
+                for (_, key), values in sorted(item for item in histograms.items() if item[0][0] == name):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float('inf'),), values):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{format_labels(key, [('le', format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(key)} {format_value(values[-1])}")
+                    lines.append(f"{name}_count{format_labels(key)} {cumulative}")
+            else:
+                for (_, key), value in sorted(item for item in counters.items() if item[0][0] == name):
+                    lines.append(f"{name}{format_labels(key)} {format_value(value)}")
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,452 @@
+"""
+Texture noise for CannaVille Pro
+Position-addressable random fields, so any band of rows can be regenerated
+on its own and tiled generation matches whole-image generation exactly, and
+periodic pattern noise (fractal gradient noise, cellular noise) that tiles
+by construction, and an optional memory-mapped noise bank that replaces the
+per-block random draws
+"""
+
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from statistics import NormalDist
+
+import numpy as np
+
+# Random streams drawn by the texture pipeline
+BASE_STREAM = 0
+DETAIL_STREAM = 1
+
+GRADIENT_STREAM = 2
+CELL_STREAM = 3
+
+# Random stream of the per-pixel detail of the extra textures of a variation set, drawn
+# as bytes (levels) and mapped through 256 quantiles of each kind of noise, in blocks of
+# VARIANT_BLOCK_ROWS rows (variation sets are never generated in tiles)
+VARIANT_STREAM = 4
+VARIANT_BLOCK_ROWS = 128
+DETAIL_LEVELS = {
+    'uniform': ((np.arange(256) + 0.5) / 256).astype(np.float32),
+    'normal': np.float32([NormalDist().inv_cdf((level + 0.5) / 256) for level in range(256)])
+}
+
+# Rows per independently seeded block; changing this changes every texture
+NOISE_BLOCK_ROWS = 16
+
+# Gradient directions for gradient noise
+GRADIENT_DIRECTIONS = 16
+
+# Largest intermediate, in elements, that a pattern evaluates at once
+PATTERN_CHUNK_ELEMENTS = 1 << 20
+
+# Noise bank: one (rows, width, 3) float32 .npy file per kind of noise, built by
+# build_noise_bank.py and memory-mapped by every worker when present
+NOISE_BANK_DIR = os.environ.get('TEXTURE_NOISE_BANK_DIR', 'assets/textures/noise_bank')
+NOISE_BANK_KINDS = ('uniform', 'normal')
+NOISE_BANK_ROWS = 4096
+NOISE_BANK_WIDTH = 1024
+NOISE_BANK_SEED = 20250625
+
+MASK64 = (1 << 64) - 1
+
+
+class NoiseField:
+    def __init__(self, seed, block_rows=NOISE_BLOCK_ROWS, cached_blocks=4):
+        """Random fields for one texture request, derived from a 64-bit seed
+
+        Each block of block_rows rows in each stream has its own generator
+        seeded by (seed, stream, block), so values depend only on position.
+        """
+        self.seed = seed
+        self.block_rows = block_rows
+        self.cached_blocks = cached_blocks
+        self._blocks = OrderedDict()
+
+    def generator(self, stream, block):
+        return np.random.default_rng([self.seed, stream, block])
+
+    def _draw(self, kind, stream, block, width, channels, out=None):
+        generator = self.generator(stream, block)
+        shape = (self.block_rows, width, channels)
+        if kind == 'uniform':
+            return generator.random(shape, dtype=np.float32, out=out)
+        return generator.standard_normal(shape, dtype=np.float32, out=out)
+
+    def _remember(self, key, data):
+        self._blocks[key] = data
+        while len(self._blocks) > self.cached_blocks:
+            self._blocks.popitem(last=False)
+
+    def _block(self, kind, stream, block, width, channels):
+        """A whole block, kept in a small LRU so overlapping bands draw it once"""
+        key = (kind, stream, block, width, channels)
+        data = self._blocks.get(key)
+        if data is None:
+            data = self._draw(kind, stream, block, width, channels)
+            self._remember(key, data)
+        else:
+            self._blocks.move_to_end(key)
+        return data
+
+    def _fill(self, kind, stream, start, stop, width, channels, out):
+        if out is None:
+            out = np.empty((stop - start, width, channels), dtype=np.float32)
+
+        first_block = start // self.block_rows
+        last_block = (stop - 1) // self.block_rows
+        row = start
+        while row < stop:
+            block, offset = divmod(row, self.block_rows)
+            take = min(self.block_rows - offset, stop - row)
+            target = out[row - start:row - start + take]
+            key = (kind, stream, block, width, channels)
+            if key not in self._blocks and take == self.block_rows:
+                # Aligned full block: draw straight into the output, remembering
+                # the edge blocks that an overlapping neighbour band will need
+                self._draw(kind, stream, block, width, channels, out=target)
+                if block in (first_block, last_block):
+                    self._remember(key, target.copy())
+            else:
+                target[...] = self._block(kind, stream, block, width, channels)[offset:offset + take]
+            row += take
+
+        return out
+
+    def uniform(self, start, stop, width, channels=3, stream=BASE_STREAM, out=None):
+        """float32 uniform [0, 1) values for rows start..stop, shaped (rows, width, channels)"""
+        return self._fill('uniform', stream, start, stop, width, channels, out)
+
+    def normal(self, start, stop, width, channels=3, stream=DETAIL_STREAM, out=None):
+        """float32 standard normal values for rows start..stop, shaped (rows, width, channels)"""
+        return self._fill('normal', stream, start, stop, width, channels, out)
+
+    def pattern(self, function, start, stop, width, **params):
+        """Rows start..stop of a periodic pattern (fbm, worley, ...) seeded by this field"""
+        return function(self.seed, start, stop, width, **params)
+
+
+class VariantNoiseField(NoiseField):
+    def __init__(self, seed, variant, block_rows=VARIANT_BLOCK_ROWS, cached_blocks=4):
+        """A NoiseField for the per-pixel detail of variant variant of a variation set
+
+        Blocks come from generators seeded by (seed, VARIANT_STREAM, variant,
+        stream, block) at 8-bit resolution: one random byte (level) per value
+        through the kind's quantile table (DETAIL_LEVELS), which is all a uint8
+        texture can show and a fraction of the cost of a float draw.
+        """
+        super().__init__(seed, block_rows, cached_blocks)
+        self.variant = variant
+
+    def generator(self, stream, block):
+        return np.random.default_rng([self.seed, VARIANT_STREAM, self.variant, stream, block])
+
+    def _draw(self, kind, stream, block, width, channels, out=None):
+        import cv2
+
+        # Raw 64-bit outputs as bytes: several times faster than Generator.bytes
+        size = self.block_rows * width * channels
+        words = self.generator(stream, block).bit_generator.random_raw(-(-size // 8))
+        raw = words.view(np.uint8)[:size].reshape(self.block_rows, width, channels)
+        if kind == 'levels':
+            if out is None:
+                return raw
+            out[...] = raw
+            return out
+
+        if out is None:
+            out = np.empty((self.block_rows, width, channels), dtype=np.float32)
+        cv2.LUT(raw.reshape(self.block_rows, -1), DETAIL_LEVELS[kind], dst=out.reshape(self.block_rows, -1))
+        return out
+
+    def levels(self, start, stop, width, channels=3, stream=BASE_STREAM):
+        """The uint8 levels behind uniform() for rows start..stop: uniform is (levels + 0.5) / 256"""
+        out = np.empty((stop - start, width, channels), dtype=np.uint8)
+        return self._fill('levels', stream, start, stop, width, channels, out)
+
+
+def mix64(*values):
+    """Hash integers to 64 bits with the splitmix64 finalizer (stable across processes)"""
+    state = 0
+    for value in values:
+        state = (state ^ (value & MASK64)) + 0x9E3779B97F4A7C15 & MASK64
+        state = (state ^ (state >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+        state = (state ^ (state >> 27)) * 0x94D049BB133111EB & MASK64
+        state ^= state >> 31
+    return state
+
+
+class NoiseBank:
+    def __init__(self, directory):
+        """Memory-map the noise files written by build_noise_bank
+        
+        The files are opened read-only, so every worker process maps the same
+        page-cache copy instead of holding its own.
+        """
+        self.directory = directory
+        self.arrays = {kind: np.load(noise_bank_path(directory, kind), mmap_mode='r') for kind in NOISE_BANK_KINDS}
+        
+        shapes = {array.shape for array in self.arrays.values()}
+        if len(shapes) != 1 or len(next(iter(shapes))) != 3:
+            raise ValueError(f"Noise bank in {directory} has mismatched shapes {sorted(shapes)}")
+        self.rows, self.width, self.channels = shapes.pop()
+        
+    def window(self, kind, rows, key):
+        """A read-only (rows, width, channels) view at a row offset selected by key"""
+        offset = mix64(*key) % (self.rows - rows + 1)
+        return self.arrays[kind][offset:offset + rows]
+        
+    def field(self, seed, **kwargs):
+        return BankedNoiseField(self, seed, **kwargs)
+
+
+class BankedNoiseField(NoiseField):
+    def __init__(self, bank, seed, block_rows=NOISE_BLOCK_ROWS, cached_blocks=4):
+        """A NoiseField whose blocks are windows of a NoiseBank instead of fresh draws
+        
+        Each block is split into segments as wide as the bank, and each
+        segment is the bank window chosen by hashing (seed, stream, block,
+        segment), so values still depend only on position.
+        """
+        super().__init__(seed, block_rows, cached_blocks)
+        self.bank = bank
+        
+    def _draw(self, kind, stream, block, width, channels, out=None):
+        bank = self.bank
+        if channels > bank.channels or self.block_rows > bank.rows:
+            return super()._draw(kind, stream, block, width, channels, out)
+            
+        segments = -(-width // bank.width)
+        if out is None and segments == 1:
+            # Whole block from one window: hand out the view, no copy
+            return bank.window(kind, self.block_rows, (self.seed, stream, block, 0))[:, :width, :channels]
+            
+        if out is None:
+            out = np.empty((self.block_rows, width, channels), dtype=np.float32)
+        for segment in range(segments):
+            columns = slice(segment * bank.width, min(width, (segment + 1) * bank.width))
+            window = bank.window(kind, self.block_rows, (self.seed, stream, block, segment))
+            out[:, columns] = window[:, :columns.stop - columns.start, :channels]
+        return out
+
+
+def noise_bank_path(directory, kind):
+    return os.path.join(directory, f"{kind}.npy")
+
+
+def build_noise_bank(directory, rows=NOISE_BANK_ROWS, width=NOISE_BANK_WIDTH, seed=NOISE_BANK_SEED, chunk_rows=256):
+    """Write the noise bank files to directory, each atomically; returns their paths
+    
+    The contents depend only on (seed, rows, width), so every host that
+    builds the bank generates the same textures.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index, kind in enumerate(NOISE_BANK_KINDS):
+        path = noise_bank_path(directory, kind)
+        partial = f"{path}.partial"
+        bank = np.lib.format.open_memmap(partial, mode='w+', dtype=np.float32, shape=(rows, width, 3))
+        generator = np.random.default_rng([seed, index])
+        for start in range(0, rows, chunk_rows):
+            chunk = np.empty(bank[start:start + chunk_rows].shape, dtype=np.float32)
+            if kind == 'uniform':
+                generator.random(chunk.shape, dtype=np.float32, out=chunk)
+            else:
+                generator.standard_normal(chunk.shape, dtype=np.float32, out=chunk)
+            bank[start:start + chunk_rows] = chunk
+        bank.flush()
+        del bank
+        os.replace(partial, path)
+        paths.append(path)
+    return paths
+
+
+def load_noise_bank(directory):
+    """The NoiseBank in directory, or None when it has not been built"""
+    if not all(os.path.isfile(noise_bank_path(directory, kind)) for kind in NOISE_BANK_KINDS):
+        return None
+    return NoiseBank(directory)
+
+
+def noise_source(bank):
+    """Tag naming where texture noise comes from ('rng', or the bank's seed and shape)
+
+    Banked and freshly drawn noise give different pixels for the same seed, so
+    the tag belongs in the key of anything stored for a texture.
+    """
+    if bank is None:
+        return 'rng'
+    return f"bank:{NOISE_BANK_SEED}:{bank.rows}x{bank.width}"
+
+
+@lru_cache(maxsize=64)
+def gradient_table(seed, period):
+    """Unit gradients at each point of a period x period lattice on a torus, as (gx, gy)"""
+    generator = np.random.default_rng([seed, GRADIENT_STREAM, period])
+    angles = generator.integers(0, GRADIENT_DIRECTIONS, size=(period, period)) * (2 * np.pi / GRADIENT_DIRECTIONS)
+    return np.cos(angles).astype(np.float32), np.sin(angles).astype(np.float32)
+
+
+@lru_cache(maxsize=64)
+def feature_table(seed, period):
+    """One feature point per cell of a period x period lattice, as (fy, fx) offsets in [0, 1)"""
+    generator = np.random.default_rng([seed, CELL_STREAM, period])
+    points = generator.random((2, period, period), dtype=np.float32)
+    return points[0], points[1]
+
+
+def fade(t):
+    """Perlin's quintic interpolation curve 6t^5 - 15t^4 + 10t^3"""
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def lattice_coordinates(start, stop, size, period):
+    """Cell index and fraction of pixel centres start..stop along a size-pixel axis of period cells"""
+    position = (np.arange(start, stop, dtype=np.float64) + 0.5) * (period / size)
+    cell = np.floor(position)
+    return cell.astype(np.int64), position - cell
+
+
+@lru_cache(maxsize=32)
+def column_weights(period, size):
+    """Left and right lattice columns, fraction and fade of every pixel column"""
+    cell, xf = lattice_coordinates(0, size, size, period)
+    return cell % period, (cell + 1) % period, xf, fade(xf)
+
+
+def gradient_row(seed, period, size, row):
+    """The x-interpolated gradient terms (a, b) of every column at lattice row row
+    
+    Gradient noise at a pixel between lattice rows j and j + 1 is then
+    a_j + yf * b_j blended with a_j+1 + (yf - 1) * b_j+1.
+    """
+    gx, gy = gradient_table(seed, period)
+    left, right, xf, sx = column_weights(period, size)
+    
+    a = (1 - sx) * gx[row, left] * xf + sx * gx[row, right] * (xf - 1)
+    b = (1 - sx) * gy[row, left] + sx * gy[row, right]
+    return a, b
+
+
+def check_period(size, period):
+    """Lattice periods must divide the texture size so cells cover whole pixel rows"""
+    if period < 1 or size % period:
+        raise ValueError(f"Pattern period {period} does not divide texture size {size}")
+
+
+def pattern_block_rows(size, period, width):
+    """Rows per pattern block: a divisor of the cell height within PATTERN_CHUNK_ELEMENTS
+    
+    Blocks never straddle a lattice row, so all rows of a block share their
+    cells, and every block has the same shape.
+    """
+    cell_rows = size // period
+    block_rows = min(cell_rows, max(1, PATTERN_CHUNK_ELEMENTS // width))
+    while cell_rows % block_rows:
+        block_rows -= 1
+    return block_rows
+
+
+def pattern_blocks(start, stop, block_rows):
+    """Yield (block_start, block_slice, out_slice) covering rows start..stop with whole blocks
+    
+    Patterns are always evaluated one whole block at a time, so every row
+    comes out of identically shaped operations however the rows are banded.
+    """
+    for block_start in range(start - start % block_rows, stop, block_rows):
+        first = max(start, block_start)
+        last = min(stop, block_start + block_rows)
+        yield block_start, slice(first - block_start, last - block_start), slice(first - start, last - start)
+
+
+def fbm(seed, start, stop, size, period=4, octaves=4, gain=0.5):
+    """Tileable fractal gradient (Perlin) noise for rows start..stop of a size x size texture
+    
+    Octave k has period << k cells across the texture, so the sum is periodic
+    in both directions. period << (octaves - 1) must divide size. Returns
+    float32 (rows, size), roughly in [-1, 1].
+    """
+    finest = period << (octaves - 1)
+    check_period(size, finest)
+    block_rows = pattern_block_rows(size, finest, size)
+    amplitudes = [gain ** k for k in range(octaves)]
+    norm = np.sqrt(2) / sum(amplitudes)
+    
+    # Neighbouring blocks share lattice rows; keep the ones this call has used
+    rows = {}
+    
+    out = np.empty((stop - start, size), dtype=np.float32)
+    for block_start, block_slice, out_slice in pattern_blocks(start, stop, block_rows):
+        coefficients = []
+        vectors = []
+        for k, amplitude in enumerate(amplitudes):
+            octave_period = period << k
+            cell, yf = lattice_coordinates(block_start, block_start + block_rows, size, octave_period)
+            sy = fade(yf)
+            
+            # Rows of a block share their lattice row in every octave
+            for row in (cell[0] % octave_period, (cell[0] + 1) % octave_period):
+                if (octave_period, row) not in rows:
+                    rows[octave_period, row] = gradient_row(seed, octave_period, size, row)
+            top = rows[octave_period, cell[0] % octave_period]
+            bottom = rows[octave_period, (cell[0] + 1) % octave_period]
+            scale = amplitude * norm
+            coefficients += [(1 - sy) * scale, (1 - sy) * yf * scale, sy * scale, sy * (yf - 1) * scale]
+            vectors += [top[0], top[1], bottom[0], bottom[1]]
+            
+        values = np.stack(coefficients, axis=1).astype(np.float32) @ np.stack(vectors)
+        out[out_slice] = values[block_slice]
+        
+    return out
+
+
+def perlin(seed, start, stop, size, period=8):
+    """Single-octave tileable gradient noise (see fbm)"""
+    return fbm(seed, start, stop, size, period=period, octaves=1)
+
+
+def worley(seed, start, stop, size, period=16):
+    """Tileable cellular (Worley F1) noise for rows start..stop of a size x size texture
+    
+    Distance from each pixel to the nearest feature point, in cell units, on
+    a torus of period x period cells; period must divide size. Returns
+    float32 (rows, size) in [0, ~1.1].
+    """
+    check_period(size, period)
+    fy, fx = feature_table(seed, period)
+    cell_rows = size // period
+    block_rows = pattern_block_rows(size, period, 9 * size)
+    cell_x, _ = lattice_coordinates(0, size, size, period)
+    u = (np.arange(size, dtype=np.float64) + 0.5) * (period / size)
+    
+    def candidate_terms(cell_y):
+        # For each of the 3x3 candidate cells, squared distance is
+        # dx^2 + (py - v)^2 = (dx^2 + py^2) - 2 v py + v^2
+        terms = []
+        heights = []
+        for dy in (-1, 0, 1):
+            row = (cell_y + dy) % period
+            for dx in (-1, 0, 1):
+                column = (cell_x + dx) % period
+                px = cell_x + dx + fx[row, column]
+                py = cell_y + dy + fy[row, column]
+                terms.append((px - u) ** 2 + py ** 2)
+                heights.append(py)
+        return np.stack([np.concatenate(terms), np.concatenate(heights)]).astype(np.float32)
+        
+    out = np.empty((stop - start, size), dtype=np.float32)
+    cell_y, terms = None, None
+    for block_start, block_slice, out_slice in pattern_blocks(start, stop, block_rows):
+        if block_start // cell_rows != cell_y:
+            cell_y = block_start // cell_rows
+            terms = candidate_terms(cell_y)
+        v = (np.arange(block_start, block_start + block_rows, dtype=np.float64) + 0.5) * (period / size)
+        
+        weights = np.stack([np.ones_like(v), -2 * v], axis=1).astype(np.float32)
+        candidates = weights @ terms
+        nearest = candidates.reshape(block_rows, 9, size).min(axis=1)
+        nearest += (v * v).astype(np.float32)[:, np.newaxis]
+        
+        out[out_slice] = np.sqrt(np.maximum(nearest, 0, out=nearest), out=nearest)[block_slice]
+        
+    return out
@@ -0,0 +1,119 @@
+"""
+PBR map derivation for CannaVille Pro
+Height, normal and packed occlusion/roughness/metalness maps derived from a
+texture's albedo in one pass over shared intermediate arrays
+"""
+
+import numpy as np
+
+# Rec. 601 luma weights, as PIL's convert('L')
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def box_blur(values, radius):
+    """Mean over a (2 * radius + 1)^2 window of a float32 array, wrapping at the edges
+
+    Wrapping keeps maps derived from a tileable texture tileable. Runs as
+    two separable running sums, so the cost does not depend on the radius.
+    """
+    window = 2 * radius + 1
+
+    # Down the rows: accumulate row by row in place, which numpy runs as
+    # contiguous vector adds (np.cumsum over axis 0 is several times slower)
+    sums = np.pad(values, [(radius + 1, radius), (0, 0)], mode='wrap')
+    for row in range(1, len(sums)):
+        np.add(sums[row], sums[row - 1], out=sums[row])
+    values = sums[window:] - sums[:-window]
+
+    sums = np.cumsum(np.pad(values, [(0, 0), (radius + 1, radius)], mode='wrap'), axis=1, dtype=np.float32)
+    values = sums[:, window:] - sums[:, :-window]
+    values /= window * window
+    return values
+
+
+def sobel(values):
+    """Wrapped 3x3 Sobel gradients (d/dx along columns, d/dy down the rows), scaled to units per pixel"""
+    padded = np.pad(values, 1, mode='wrap')
+
+    dx = padded[:, 2:] - padded[:, :-2]
+    gx = dx[:-2] + dx[2:]
+    gx += 2 * dx[1:-1]
+    gx /= 8
+
+    dy = padded[2:] - padded[:-2]
+    gy = dy[:, :-2] + dy[:, 2:]
+    gy += 2 * dy[:, 1:-1]
+    gy /= 8
+    return gx, gy
+
+
+def to_uint8(values, out=None):
+    """Round floats in [0, 1] to uint8, scaling values in place"""
+    values *= 255
+    values += 0.5
+    if out is None:
+        return values.astype(np.uint8)
+    np.copyto(out, values, casting='unsafe')
+    return out
+
+
+def derive_pbr_maps(img_array, normal_strength, blur_radius, ao_strength, roughness_range, metalness=0.0):
+    """Height, normal and ORM maps of a uint8 RGB texture, as uint8 arrays by name
+
+    Height is the luminance stretched to the full range. Normals follow the
+    OpenGL convention (green up) used by three.js and Blender, with the
+    height gradient scaled by normal_strength. Ambient occlusion darkens
+    cavities below the blur_radius-blurred height, up to ao_strength;
+    roughness maps the blurred gradient magnitude (local surface detail)
+    onto roughness_range. The ORM map packs occlusion, roughness and
+    metalness into R, G and B, as glTF and three.js read them.
+    """
+    height = img_array.reshape(-1, 3) @ LUMA_WEIGHTS
+    height = height.reshape(img_array.shape[:2])
+    low, high = float(height.min()), float(height.max())
+    height -= low
+    height /= max(high - low, 1e-6)
+
+    # Normal (-dh/dx, dh/dy, 1), normalized: rows run down but the green axis points up
+    nx, ny = sobel(height)
+    nx *= -normal_strength
+    ny *= normal_strength
+    slope = nx * nx
+    slope += ny * ny
+    nz = slope + 1
+    np.sqrt(nz, out=nz)
+    np.reciprocal(nz, out=nz)
+    normal = np.empty(img_array.shape, dtype=np.uint8)
+    for channel, component in enumerate((nx * nz, ny * nz, nz)):
+        component += 1
+        component *= 0.5
+        to_uint8(component, normal[..., channel])
+    del nx, ny, nz
+
+    orm = np.empty(img_array.shape, dtype=np.uint8)
+
+    # Occlusion: how far each pixel sits below its neighbourhood, relative to the typical depth
+    cavity = box_blur(height, blur_radius)
+    cavity -= height
+    np.maximum(cavity, 0, out=cavity)
+    depth = float(cavity.mean()) * 3 or 1.0
+    cavity *= -ao_strength / depth
+    cavity += 1
+    np.maximum(cavity, 1 - ao_strength, out=cavity)
+    to_uint8(cavity, orm[..., 0])
+    del cavity
+
+    # Roughness: detailed (high-gradient) areas scatter more light than smooth ones
+    np.sqrt(slope, out=slope)
+    detail = box_blur(slope, blur_radius)
+    del slope
+    detail /= float(detail.mean()) * 2 or 1.0
+    np.minimum(detail, 1, out=detail)
+    low, high = roughness_range
+    detail *= high - low
+    detail += low
+    to_uint8(detail, orm[..., 1])
+    del detail
+
+    orm[..., 2] = round(metalness * 255)
+    return {'height': to_uint8(height), 'normal': normal, 'orm': orm}
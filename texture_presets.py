@@ -0,0 +1,161 @@
+"""
+Preset texture manifest for CannaVille Pro
+Index of the preset textures pre-baked by bake_presets.py, so preset requests
+are answered with files already on disk instead of a generation job
+"""
+
+import os
+import json
+import logging
+import threading
+
+from texture_cache import normalize_key, key_digest
+
+logger = logging.getLogger(__name__)
+
+PRESET_MANIFEST_VERSION = 1
+
+
+def variant_key(prompt, style, resolution, category, fmt, source):
+    """Lookup key of one baked texture: the digest of the request and noise source, plus its format"""
+    return f"{key_digest(normalize_key(prompt, style, resolution, category) + (source,))}.{fmt}"
+
+
+def payload_files(payload):
+    """Asset paths (relative, no leading slash) written for a save_texture payload"""
+    urls = {payload['imageUrl'], payload['thumbnailUrl']}
+    urls.update(level['url'] for level in payload.get('mipLevels', []))
+    urls.update(payload.get('maps', {}).values())
+    return sorted(url.lstrip('/') for url in urls)
+
+
+def manifest_variants(manifest):
+    """Yield (group, name, preset, style, resolution, fmt, payload) for every baked texture"""
+    for group, presets in (manifest or {}).get('presets', {}).items():
+        for name, preset in presets.items():
+            for style, resolutions in preset['textures'].items():
+                for resolution, formats in resolutions.items():
+                    for fmt, payload in formats.items():
+                        yield group, name, preset, style, int(resolution), fmt, payload
+
+
+def read_manifest(path):
+    """Load a manifest; None if it is missing, unreadable or from another version"""
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable preset manifest {path}: {str(e)}")
+        return None
+
+    if manifest.get('version') != PRESET_MANIFEST_VERSION:
+        logger.warning(f"Ignoring preset manifest {path} with version {manifest.get('version')}")
+        return None
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """Write the manifest atomically, so the service never reads a partial file"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    partial = f"{path}.partial"
+    with open(partial, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(partial, path)
+
+
+class PresetManifest:
+    def __init__(self, path, noise_source):
+        """Serve lookups from the manifest at path, re-reading it whenever the file changes
+
+        Only textures baked with the same noise source (see
+        texture_noise.noise_source) answer lookups.
+        """
+        self.path = path
+        self.noise_source = noise_source
+
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._manifest = None
+        self._index = {}
+
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'reloads': 0
+        }
+
+    def _refresh(self):
+        """Reload the manifest if the file was replaced (a re-bake) since it was last read"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+
+        manifest = read_manifest(self.path) if mtime is not None else None
+        index = {}
+        for group, name, preset, style, resolution, fmt, payload in manifest_variants(manifest):
+            index[variant_key(preset['prompt'], style, resolution, preset['category'], fmt,
+                              manifest.get('noise_source'))] = payload
+
+        with self._lock:
+            self._mtime = mtime
+            self._manifest = manifest
+            self._index = index
+            self.counters['reloads'] += 1
+        if manifest is not None:
+            logger.info(f"Loaded preset manifest {self.path} ({len(index)} textures)")
+
+    def lookup(self, prompt, style, resolution, category, fmt, levels=False):
+        """Return a copy of the baked save_texture payload for a request, or None
+
+        A payload without mip levels cannot answer a levels request; extra mip
+        levels are dropped when the request did not ask for them. Entries whose
+        texture file has gone are treated as misses.
+        """
+        self._refresh()
+        with self._lock:
+            payload = self._index.get(variant_key(prompt, style, resolution, category, fmt, self.noise_source))
+
+        if payload is not None and levels and 'mipLevels' not in payload:
+            payload = None
+        if payload is not None and not os.path.isfile(payload['imageUrl'].lstrip('/')):
+            with self._lock:
+                self.counters['stale'] += 1
+            payload = None
+
+        with self._lock:
+            self.counters['hits' if payload is not None else 'misses'] += 1
+        if payload is None:
+            return None
+
+        payload = dict(payload)
+        if not levels:
+            payload.pop('mipLevels', None)
+        return payload
+
+    def presets(self):
+        """The baked presets by group and name (with their texture URLs), or None if nothing is baked"""
+        self._refresh()
+        with self._lock:
+            return self._manifest['presets'] if self._manifest is not None else None
+
+    def stats(self):
+        """Lookup counters and what the loaded manifest holds"""
+        self._refresh()
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'path': self.path,
+                'loaded': self._manifest is not None,
+                'baked': self._manifest['baked'] if self._manifest is not None else None,
+                'noise_source': self._manifest.get('noise_source') if self._manifest is not None else None,
+                'textures': len(self._index)
+            })
+        return stats
@@ -0,0 +1,141 @@
+"""
+Static asset responses for CannaVille Pro
+Conditional file responses shared by the asset routes: strong ETags cached per
+file, 304s for current client copies, long-lived caching of content-addressed
+files, precompressed siblings and byte ranges
+"""
+
+import os
+import stat
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+
+from flask import Response, send_file
+
+# Precompressed siblings (<file>.br, <file>.gz) in order of preference
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Content-addressed files never change under their name
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Bytes hashed per read when computing an ETag
+ETAG_CHUNK_BYTES = 1024 * 1024
+
+mimetypes.add_type('model/gltf-binary', '.glb')
+mimetypes.add_type('model/gltf+json', '.gltf')
+
+
+class StaticResponder:
+    def __init__(self, max_entries=4096):
+        """Serve files with ETags computed once per file version, remembering at most max_entries of them
+
+        A file's ETag is a digest of its bytes, reused for as long as the
+        file keeps its inode, mtime and size.
+        """
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._etags = OrderedDict()
+
+        self.counters = {
+            'responses': 0,
+            'not_modified': 0,
+            'ranges': 0,
+            'precompressed': 0,
+            'etags_computed': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def etag(self, path, st):
+        """Strong ETag of the file at path, whose os.stat() is st"""
+        identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._etags.get(path)
+            if entry is not None and entry[0] == identity:
+                self._etags.move_to_end(path)
+                return entry[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(ETAG_CHUNK_BYTES), b''):
+                digest.update(chunk)
+        tag = digest.hexdigest()[:32]
+
+        with self._lock:
+            self._etags[path] = (identity, tag)
+            self._etags.move_to_end(path)
+            while len(self._etags) > self.max_entries:
+                self._etags.popitem(last=False)
+            self.counters['etags_computed'] += 1
+        return tag
+
+    def precompressed(self, path, st, accept_encodings):
+        """(encoding, path, stat, varies) of the precompressed sibling of path to serve
+
+        The encoding is None (with path and st) when the client accepts no
+        up-to-date sibling; varies tells whether path has any sibling at all.
+        """
+        varies = False
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            try:
+                sibling_st = os.stat(path + suffix)
+            except OSError:
+                continue
+            varies = True
+            # A sibling older than the file was compressed from an earlier version
+            if sibling_st.st_mtime_ns >= st.st_mtime_ns and accept_encodings[encoding] > 0:
+                return encoding, path + suffix, sibling_st, True
+        return None, path, st, varies
+
+    def send(self, path, request, mimetype=None, immutable=False):
+        """Response for the file at path: 304 if the request's copy is current, else the file or a range of it
+
+        Content-addressed (immutable) files are cached for a year; others
+        are revalidated on every use. Raises FileNotFoundError for a path
+        that is not a file.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise FileNotFoundError(path)
+        mimetype = mimetype or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+        encoding, served, served_st, varies = self.precompressed(path, st, request.accept_encodings)
+        tag = self.etag(served, served_st)
+        self._count('responses')
+
+        if request.if_none_match.contains_weak(tag):
+            self._count('not_modified')
+            response = Response(status=304)
+            response.set_etag(tag)
+        else:
+            response = send_file(served, mimetype=mimetype, etag=tag, conditional=True,
+                                 last_modified=served_st.st_mtime)
+            if encoding is not None:
+                self._count('precompressed')
+                response.headers['Content-Encoding'] = encoding
+            if response.status_code == 206:
+                self._count('ranges')
+
+        if immutable:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        if varies:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    def stats(self):
+        """Snapshot of counters and cached ETags"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['etags_cached'] = len(self._etags)
+        return stats
@@ -0,0 +1,90 @@
+"""
+Tiled texture output for CannaVille Pro
+Disk-backed pixel buffers, banded reductions and streaming encoders for
+textures too large to hold in worker memory
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+# Formats the streaming encoders can write, the OpenCV flag each profile param maps to
+# (by name, so OpenCV is only imported when a tiled texture is encoded) and the profile
+# params left out because the encoder would hold the whole image to honour them
+# (libjpeg's Huffman optimization pass buffers every coefficient before writing)
+TILED_FORMATS = {
+    'jpeg': {
+        'extension': '.jpg',
+        'flags': {'quality': 'IMWRITE_JPEG_QUALITY'},
+        'buffered': ('optimize',)
+    },
+    'png': {
+        'extension': '.png',
+        'flags': {'compress_level': 'IMWRITE_PNG_COMPRESSION'},
+        'buffered': ()
+    }
+}
+
+
+def open_pixel_buffer(resolution, scratch_dir):
+    """Create a (resolution, resolution, 3) uint8 np.memmap in scratch_dir; returns (path, pixels)"""
+    fd, path = tempfile.mkstemp(prefix='pixels_', suffix='.raw', dir=scratch_dir)
+    os.close(fd)
+    pixels = np.memmap(path, dtype=np.uint8, mode='w+', shape=(resolution, resolution, 3))
+    return path, pixels
+
+
+def scratch_file(scratch_dir, fmt):
+    """Reserve a scratch path for an encoded texture in the given format"""
+    fd, path = tempfile.mkstemp(prefix='texture_', suffix=TILED_FORMATS[fmt]['extension'], dir=scratch_dir)
+    os.close(fd)
+    return path
+
+
+def box_reduce(pixels, factor, band_rows):
+    """Average factor x factor blocks of a uint8 image, reading band_rows rows at a time"""
+    height, width, channels = pixels.shape
+    band_rows = max(factor, band_rows - band_rows % factor)
+    area = factor * factor
+
+    reduced = np.empty((height // factor, width // factor, channels), dtype=np.uint8)
+    for start in range(0, height, band_rows):
+        band = np.asarray(pixels[start:start + band_rows], dtype=np.uint32)
+        rows = band.shape[0] // factor
+        sums = band.reshape(rows, factor, width // factor, factor, channels).sum(axis=(1, 3))
+        sums += area // 2
+        sums //= area
+        reduced[start // factor:start // factor + rows] = sums
+
+    return reduced
+
+
+def swap_channels(pixels, band_rows):
+    """Swap RGB <-> BGR in place, a band of rows at a time"""
+    for start in range(0, pixels.shape[0], band_rows):
+        band = pixels[start:start + band_rows]
+        band[...] = band[..., ::-1]
+
+
+def write_image(pixels, path, fmt, band_rows, **params):
+    """Encode an RGB uint8 buffer (normally a np.memmap) to path
+
+    OpenCV's JPEG and PNG encoders consume the buffer row by row, so a
+    memmap is paged through rather than copied into memory. The buffer is
+    swapped to BGR for the encoder and restored afterwards. Params the
+    format lists as buffered are dropped so the encode stays streaming.
+    """
+    import cv2
+
+    flags = []
+    for name, value in params.items():
+        if name not in TILED_FORMATS[fmt]['buffered']:
+            flags += [getattr(cv2, TILED_FORMATS[fmt]['flags'][name]), int(value)]
+
+    swap_channels(pixels, band_rows)
+    try:
+        if not cv2.imwrite(path, pixels, flags):
+            raise IOError(f"Could not encode {fmt} texture to {path}")
+    finally:
+        swap_channels(pixels, band_rows)
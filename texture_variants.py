@@ -0,0 +1,157 @@
+"""
+Asset variants for CannaVille Pro
+Resized and re-encoded copies of generated assets, kept in a sharded disk
+cache bounded by a byte budget so repeat requests are plain file responses
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from texture_cache import key_digest
+
+logger = logging.getLogger(__name__)
+
+
+def load_resized(path, width, reducing_gap=2.0):
+    """Open an image scaled to width (keeping its aspect ratio), decoding as little as possible
+
+    Images are never enlarged; a width of 0 keeps the image's own. JPEG
+    sources are decoded straight at 1/2, 1/4 or 1/8 scale where that still
+    covers width (draft), and the rest of the reduction starts with
+    whole-block averaging (reduce) before the final Lanczos pass.
+    """
+    with Image.open(path) as image:
+        width = min(width or image.width, image.width)
+        size = (width, max(1, round(image.height * width / image.width)))
+        image.draft('RGB', size)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        if image.size == size:
+            image.load()
+            return image
+        return image.resize(size, Image.LANCZOS, reducing_gap=reducing_gap)
+
+
+class VariantCache:
+    def __init__(self, directory, budget=512 * 1024 * 1024, shards=256):
+        """Cache variant files under directory in `shards` subdirectories, at most budget bytes in total
+
+        The least recently served files are deleted first. Several processes
+        may share the directory; each adopts the files the others wrote as it
+        serves them.
+        """
+        self.directory = directory
+        self.budget = budget
+        self.shards = shards
+
+        self._lock = threading.Lock()
+        self._files = OrderedDict()
+        self._bytes = 0
+
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Index existing variant files, least recently served first"""
+        entries = []
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith('.partial'):
+                    continue
+                try:
+                    st = os.stat(os.path.join(shard_dir, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, os.path.join(shard, name), st.st_size))
+
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self._bytes += size
+
+        self._evict()
+
+    def _name(self, key, extension):
+        digest = key_digest(key)
+        return os.path.join(f"{int(digest[:8], 16) % self.shards:02x}", f"{digest}.{extension}")
+
+    def get(self, key, extension):
+        """Path of the cached variant for key, or None"""
+        name = self._name(key, extension)
+        path = os.path.join(self.directory, name)
+        try:
+            size = os.stat(path).st_size
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._files.pop(name, 0)
+                self.counters['misses'] += 1
+            return None
+
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+            else:
+                self._files[name] = size
+                self._bytes += size
+                self._evict()
+            self.counters['hits'] += 1
+        return path
+
+    def put(self, key, extension, data):
+        """Write a variant and return its path (None if it could not be written)"""
+        name = self._name(key, extension)
+        path = os.path.join(self.directory, name)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.partial"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(partial, 'wb') as f:
+                f.write(data)
+            os.replace(partial, path)
+        except OSError as e:
+            logger.warning(f"Asset variant write failed: {str(e)}")
+            return None
+
+        with self._lock:
+            self._bytes -= self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._bytes += len(data)
+            self._evict(keep=name)
+        return path
+
+    def _evict(self, keep=None):
+        """Delete least recently served files until under budget, sparing keep (lock held)"""
+        while self._bytes > self.budget and len(self._files) > (keep is not None):
+            name, size = self._files.popitem(last=False)
+            if name == keep:
+                self._files[name] = size
+                continue
+            self._bytes -= size
+            self.counters['evictions'] += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Snapshot of counters and occupancy"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'files': len(self._files),
+                'bytes': self._bytes,
+                'budget': self.budget
+            })
+        return stats
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+CannaVille Pro - AI Texture Service WSGI Entry Point
+Loads ai-texture-generator.py (not importable by name) and exposes its app factory
+Usage: gunicorn --bind 0.0.0.0:5000 'wsgi:create_app()'
+       TEXTURE_WARMUP=sync gunicorn --preload --bind 0.0.0.0:5000 'wsgi:create_app()'
+"""
+
+import os
+import sys
+import importlib.util
+
+GENERATOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai-texture-generator.py')
+
+
+def load_generator_module():
+    """Import ai-texture-generator.py as the ai_texture_generator module"""
+    module = sys.modules.get('ai_texture_generator')
+    if module is not None:
+        return module
+
+    sys.path.insert(0, os.path.dirname(GENERATOR_PATH))
+    spec = importlib.util.spec_from_file_location('ai_texture_generator', GENERATOR_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['ai_texture_generator'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+create_app = load_generator_module().create_app